@@ -1,19 +1,79 @@
 # app.py
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask import Flask, Blueprint, Response, current_app, render_template, request, redirect, url_for, jsonify, session, flash, stream_with_context
+from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import date, timedelta
+from collections import OrderedDict
+import bisect
+import math
 import json
 import os
 import random
 import glob
 import string
+import time
 import uuid
+import click
+from scheduler import Scheduler
+from event_log import EventLog
+from spatial import SpatialGrid
+from spawner import Spawner, load_spawn_tables
+from pathfinding import TileMap, FlowFieldCache
+from currency import CurrencyLedger
+from session_store import SessionStore, ServerSideSessionInterface
+from outbound import OutboundQueues, payload_size
+from bulk_io import bounded_map, dump_line, iter_ndjson
+from combat import CombatGuard, distance_between
+
+DEFAULT_CONFIG = {
+    'SECRET_KEY': 'supersecretkey_for_synapse',
+    'PERMANENT_SESSION_LIFETIME': timedelta(days=30),
+    # 같은 유저가 여러 세션으로 접속할 때: 'latest_wins' (기존 세션 종료) 또는 'reject_new' (새 접속 거부)
+    'MULTI_SESSION_POLICY': 'latest_wins',
+    # 세션 데이터는 서버에 저장하고 쿠키에는 세션 id만 담는다
+    'SESSION_DB_FILE': 'sessions.sqlite3',
+    # False면 웹 요청만 처리하고 게임 월드를 만들지 않는다 (소켓 접속 거부)
+    'GAME_SERVER_ENABLED': True,
+    # 첫 플레이어 접속 때 월드 틱 루프를 백그라운드로 시작할지 (테스트에서는 끄고 직접 틱)
+    'GAME_TICK_LOOP': True,
+    # 유지보수 예약 작업 (일일 보너스/초기화, 저장소 정리) 을 이 프로세스에서 돌릴지 (첫 요청 때 시작).
+    # 워커 프로세스가 여럿이면 하나에서만 켠다
+    'MAINTENANCE_JOBS': True,
+    # 게임 소켓 전송 설정 (TRANSPORT_PROFILES의 이름)
+    'SOCKET_TRANSPORT_PROFILE': 'websocket',
+    # /admin/* 경로를 쓸 수 있는 유저 이름
+    'ADMIN_USERS': ()
+}
+
+# 소켓 전송 프로필. max_buffered_packets를 뺀 나머지는 Engine.IO 서버 옵션이다
+# - compression_threshold: 이 크기 이상인 롱 폴링 응답만 압축
+#   (웹소켓 permessage-deflate는 Engine.IO가 아니라 비동기 서버(eventlet/gevent 등)가 정한다)
+# - max_http_buffer_size: 클라이언트가 보낼 수 있는 메시지 최대 크기
+# - max_buffered_packets: 클라이언트별 송신 대기열 한도, 넘으면 느린 클라이언트로 보고 연결을 끊는다
+TRANSPORT_PROFILES = {
+    'websocket': {  # 웹소켓 전용, 빠른 끊김 감지
+        'transports': ['websocket'],
+        'ping_interval': 10,
+        'ping_timeout': 5,
+        'max_http_buffer_size': 64 * 1024,
+        'http_compression': True,
+        'compression_threshold': 2048,
+        'max_buffered_packets': 100
+    },
+    'compat': {  # 웹소켓이 막힌 환경용 (롱 폴링 허용)
+        'transports': ['polling', 'websocket'],
+        'ping_interval': 25,
+        'ping_timeout': 20,
+        'max_http_buffer_size': 64 * 1024,
+        'http_compression': True,
+        'compression_threshold': 1024,
+        'max_buffered_packets': 300
+    }
+}
 
-app = Flask(__name__)
-app.secret_key = 'supersecretkey_for_synapse'
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=30)
-socketio = SocketIO(app, cors_allowed_origins="*")
+main = Blueprint('main', __name__, cli_group=None)
+socketio = SocketIO()
+session_store = None  # create_app에서 생성
 
 # --- 상수 정의 ---
 USERS_FILE = 'users.json'
@@ -24,18 +84,136 @@ SHOP_ITEMS = {
     'item004': {'name': 'Cool Website Theme', 'price': 200, 'icon': '🎨'}
 }
 DAILY_LOGIN_REWARD = 5
-
-# MMORPG 게임 상태
-game_world = {
-    'players': {},  # {session_id: {username, x, y, level, exp, hp, last_seen}}
-    'monsters': {},  # {monster_id: {x, y, hp, type}}
-    'items': {},  # {item_id: {x, y, type}}
-    'duels': {},  # {duel_id: {player1_id, player2_id, status, arena_pos}}
-    'duel_requests': {}  # {request_id: {from_player, to_player, timestamp}}
-}
-
-with open('translations.json', 'r', encoding='utf-8') as f:
-    translations = json.load(f)
+DUEL_REQUEST_TTL = 60  # 듀얼 신청 만료 시간 (초)
+DUEL_ARENA_SLOTS = 16  # 동시에 진행 가능한 듀얼 (아레나 인스턴스) 수
+DUEL_TIMEOUT = 120  # 듀얼 제한 시간 (초), 넘으면 무승부
+DUEL_TICK_INTERVAL = 0.5  # 듀얼 인스턴스 상태 동기화 주기 (초)
+MAX_DUEL_SPECTATORS = 10  # 듀얼당 최대 관전자 수
+DUEL_START_POSITIONS = ({'x': 350, 'y': 300}, {'x': 450, 'y': 300})  # 아레나 안 시작 위치
+JOB_BATCH_SIZE = 100  # 전체 유저 작업의 배치 크기
+EXPORT_WORKERS = 8  # 유저 데이터 내보내기/가져오기 파일 처리 스레드 수
+IMPORT_MAX_ERRORS = 1000  # 가져오기 결과에 남기는 오류 수 상한
+STATS_CHART_DAYS = 7  # 대시보드 완료 차트에 보여 주는 일수
+GOAL_INDEX_CACHE_SIZE = 256  # 목표 인덱스를 메모리에 둘 최대 유저 수
+MAX_BATCH_OPS = 100  # /goals/batch 한 번에 받는 최대 변경 수
+SPAWN_TABLES_FILE = 'spawn_tables.json'
+WORLD_MAP_FILE = 'world_map.json'
+WORLD_EVENT_LOG = 'world_events.ndjson'
+WORLD_SNAPSHOT_FILE = 'world_snapshot.json'
+WORLD_SNAPSHOT_INTERVAL = 300  # 월드 스냅샷 주기 (초)
+AI_WAKE_RADIUS = 300  # 이 반경 안에 플레이어가 없으면 몬스터 AI 휴면 (감지 범위보다 커야 함)
+AI_FAR_INTERVAL = 0.5  # 깨어 있지만 교전 중이 아닌 몬스터의 AI 갱신 주기 (초)
+OUTBOUND_MAX_DEPTH = 32  # 느린 클라이언트별로 모아 둘 메시지 수 (합친 뒤 기준)
+OUTBOUND_BACKLOG_PACKETS = 8  # 전송 대기열이 이보다 길면 느린 클라이언트로 보고 대기열에 모은다
+OUTBOUND_FLUSH_INTERVAL = 0.25  # 느린 클라이언트 확인 및 모아 둔 메시지 전송 주기 (초)
+OUTBOUND_SATURATED_FLUSHES = 20  # 대기열이 이 횟수만큼 연속으로 가득 차 있으면 연결 종료 (약 5초)
+MONSTER_ATTACK_RANGE = 80  # 서버 판정 공격 사거리 (클라이언트 50 + 지연 동안 몬스터가 움직이는 여유)
+ITEM_COLLECT_RANGE = 130  # 서버 판정 수집 사거리 (클라이언트 100 + 여유)
+DUEL_ATTACK_RANGE = 150  # 듀얼 상대 공격 사거리 (아레나 좌표)
+ACTION_COOLDOWNS = {'attack_monster': 0.25, 'attack_player': 0.25, 'monster_ai_update': 0.08}  # 세션별 최소 행동 간격 (초), 공격은 클라이언트 휘두르기 주기 (0.3초) 이하
+COMBAT_WINDOW = 10  # 거부된 행동 집계 구간 (초)
+COMBAT_MAX_REJECTIONS = 50  # 한 구간에 이보다 많이 거부된 클라이언트는 연결 종료
+MOVE_SPEED_LIMIT = 700  # 서버가 받아들이는 최대 이동 속도 (px/초, 클라이언트 이동은 프레임 기준이라 여유 있게)
+MOVE_BURST = 250  # 지연으로 몰려 온 이동/대쉬를 위해 한 번에 허용하는 최대 거리 (px)
+
+# MMORPG 게임 상태 (게임 서버가 시작될 때 init_game_world에서 만든다)
+game_world = None  # {players, monsters, items, duels, duel_requests}
+event_log = None  # 월드 변경 이벤트 로그 (재시작 시 복구용)
+last_positions = {}  # {username: {x, y}} 복구된 마지막 위치 (재접속 시 사용)
+
+# 장애물 타일맵과 플레이어(무리)별 공유 플로우 필드
+world_map = None
+flow_fields = None
+
+# 몬스터 AI LOD: 격자 인덱스와 깨어 있는 몬스터 목록
+monster_grid = None
+player_grid = None  # 듀얼 중이 아닌 플레이어만
+item_grid = None  # 사거리 판정용 아이템 위치
+awake_monsters = {}  # {monster_id: 다음 AI 갱신 시각}, 여기 없는 몬스터는 휴면
+
+# 서버 판정 전투 (세션별 쿨다운, 거부된 행동 집계)
+combat = None
+
+# 비어 있는 아레나 번호 (듀얼 인스턴스 할당용)
+free_arenas = []
+
+# 유저 이름 <-> 세션 id 인덱스 (on_connect/on_disconnect에서 유지)
+user_sessions = {}  # {username: session_id}
+session_users = {}  # {session_id: username}
+
+_translations = None
+_world_map = None
+
+def get_translations():
+    """번역 데이터 (처음 쓸 때 읽는다)"""
+    global _translations
+    if _translations is None:
+        with open('translations.json', 'r', encoding='utf-8') as f:
+            _translations = json.load(f)
+    return _translations
+
+def get_world_map():
+    """장애물 타일맵 (처음 쓸 때 읽는다, 웹 페이지와 게임 서버가 같이 쓴다)"""
+    global _world_map
+    if _world_map is None:
+        _world_map = TileMap.load(WORLD_MAP_FILE)
+    return _world_map
+
+# --- 월드 실행 환경 (헤드리스 시뮬레이터에서 교체) ---
+def room_members(room):
+    """월드 이벤트 방의 세션 id 목록 ('game_world', 세션 id, 듀얼 방)"""
+    if room == 'game_world':
+        return [sid for sid, player in game_world['players'].items() if not player.get('in_duel')]
+    if room in game_world['players']:
+        return [room]
+    if room and room.startswith('duel_') and room[5:] in game_world['duels']:
+        duel = game_world['duels'][room[5:]]
+        return [duel['player1_id'], duel['player2_id'], *duel['spectators']]
+    return []
+
+def in_room(session_id, room):
+    player = game_world['players'].get(session_id)
+    if player is None:
+        return False
+    if room == 'game_world':
+        return not player.get('in_duel')
+    if room == session_id:
+        return True
+    duel = game_world['duels'].get(room[5:]) if room and room.startswith('duel_') else None
+    return duel is not None and (session_id in (duel['player1_id'], duel['player2_id']) or session_id in duel['spectators'])
+
+def socketio_sink(event, data, room=None, skip_sid=None):
+    """월드 이벤트 전송. 느린 클라이언트는 빼고 방 전체에 한 번 보내고, 느린 클라이언트 몫은 대기열에 넣는다"""
+    skipped = [skip_sid] if isinstance(skip_sid, str) else list(skip_sid or ())
+    # slow는 flush가 통째로 바꿔 끼우는 frozenset이라 다른 스레드가 갱신해도 안전하게 순회된다
+    slow = [sid for sid in outbound.slow if sid not in skipped and in_room(sid, room)]
+    if slow:
+        size = payload_size(data)
+        for sid in slow:
+            outbound.put(sid, event, data, size)
+    socketio.emit(event, data, room=room, skip_sid=(skipped + slow) or None)
+
+# 느린 클라이언트별 송신 대기열 - 상태 메시지는 최신 것만 남긴다
+outbound = OutboundQueues({
+    'game_state': lambda data: 'game_state',
+    'duel_state': lambda data: 'duel_state',
+    'player_moved': lambda data: ('player_moved', data['session_id']),
+    'monster_damaged': lambda data: ('monster_damaged', data['monster_id'])
+}, max_depth=OUTBOUND_MAX_DEPTH, backlog_packets=OUTBOUND_BACKLOG_PACKETS,
+   max_saturated_flushes=OUTBOUND_SATURATED_FLUSHES)
+
+world_rng = random.Random()  # 게임 로직의 난수 (데미지, 보상, 스폰 위치)
+world_clock = time.time  # 게임 로직의 시계 (쿨다운, 리스폰, 듀얼 제한 시간)
+event_sink = socketio_sink  # 월드 이벤트 출력 (event, data, room, skip_sid)
+persist_progress = True  # False면 월드 플레이어의 진행도/점수를 저장하지 않는다 (시뮬레이션 봇)
+
+def configure_world(rng=None, clock=None, sink=None, persist=True):
+    """월드 로직의 난수/시계/이벤트 출력 교체 (init_game_world 전에 호출)"""
+    global world_rng, world_clock, event_sink, persist_progress
+    world_rng = rng or random.Random()
+    world_clock = clock or time.time
+    event_sink = sink or socketio_sink
+    persist_progress = persist
 
 # --- 데이터 관리 함수 ---
 def load_data(filename, default_data):
@@ -51,97 +229,326 @@ def save_data(data, filename):
     with open(filename, 'w', encoding='utf-8') as f: json.dump(data, f, indent=4)
 
 # --- 유저 데이터 관리 ---
+def user_data_path(username, data_type):
+    return f"data_{username}_{data_type}.json"
+
 def get_user_data_path(data_type):
     if 'username' in session:
-        return f"data_{session['username']}_{data_type}.json"
+        return user_data_path(session['username'], data_type)
     return None
 
-def load_user_goals():
-    path = get_user_data_path('goals')
-    if not path: return []
-    goals = load_data(path, [])
-    today_str = str(date.today())
+def iter_username_batches(batch_size=JOB_BATCH_SIZE):
+    """가입된 전체 유저 이름을 batch_size 단위로 나눠서 반환"""
+    usernames = list(load_data(USERS_FILE, {}))
+    for i in range(0, len(usernames), batch_size):
+        yield usernames[i:i + batch_size]
+
+def ensure_goal_ids(goals):
+    """id가 없는 (이전 버전) 목표에 고정 id 부여. 변경이 있으면 True"""
+    changed = False
+    for goal in goals:
+        if 'id' not in goal:
+            goal['id'] = str(uuid.uuid4())
+            changed = True
+    return changed
+
+def reset_recurring_goals(goals, today_str):
+    """오늘 완료하지 않은 반복 목표를 진행 중으로 되돌림. 변경이 있으면 True"""
+    changed = False
     for goal in goals:
-        if goal.get('type') == 'recurring' and goal.get('last_completed') != today_str:
+        if goal.get('type') == 'recurring' and goal.get('last_completed') != today_str and goal['status'] != 'In Progress':
             goal['status'] = 'In Progress'
-    save_data(goals, path)
-    return goals
+            changed = True
+    return changed
 
-def save_user_goals(goals):
+def load_user_goals(copy=False):
+    """사용자 목표 목록. 반복 목표 상태는 메모리에서만 오늘 기준으로 계산한다 (copy는 load_user_goal_index 참고)"""
+    return load_user_goal_index(copy)[0]
+
+def save_user_goals(goals, stats=None):
+    """목표 저장. 변경을 반영한 집계를 주면 함께 저장"""
     path = get_user_data_path('goals')
-    if path: save_data(goals, path)
+    if path:
+        save_data(goals, path)
+        _goal_index_cache.pop(path, None)
+        if stats is not None:
+            save_goal_stats(session['username'], stats, str(date.today()))
+
+# --- 목표 날짜 인덱스 ---
+_goal_index_cache = OrderedDict()  # {path: (mtime_ns, today_str, goals, index)}, 최근에 쓴 순서 (LRU)
+
+def build_goal_index(goals):
+    """마감일 기준 목표 인덱스 생성"""
+    by_deadline = sorted((goal['deadline'], i) for i, goal in enumerate(goals) if goal.get('deadline'))
+    return {
+        'deadlines': [deadline for deadline, _ in by_deadline],  # 정렬된 마감일 (이분 탐색용)
+        'deadline_goals': [i for _, i in by_deadline],  # 마감일 순서의 목표 인덱스
+        'by_id': {goal['id']: i for i, goal in enumerate(goals)}  # 목표 id -> 리스트 위치
+    }
+
+def load_user_goal_index(copy=False):
+    """목표 목록과 인덱스 (파일이 바뀌거나 날짜가 바뀔 때만 재생성).
+
+    기본으로는 캐시의 목록을 그대로 돌려주므로 읽기만 한다. 고친 뒤 저장하는 경로는 copy=True로
+    목표들의 복사본을 받는다 (저장 (save_user_goals) 전까지 캐시에는 반영되지 않는다).
+    인덱스는 항상 캐시와 공유하므로 읽기만 한다.
+    """
+    path = get_user_data_path('goals')
+    if not path: return [], build_goal_index([])
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    today_str = str(date.today())
+    cached = _goal_index_cache.get(path)
+    if cached and cached[0] == mtime and cached[1] == today_str:
+        _goal_index_cache.move_to_end(path)
+        goals = cached[2]
+        return ([dict(goal) for goal in goals] if copy else goals), cached[3]
+    goals = load_data(path, [])
+    if ensure_goal_ids(goals):
+        # 이전 버전 파일은 한 번만 id를 기록해 둔다
+        save_data(goals, path)
+        mtime = os.stat(path).st_mtime_ns
+    # 파일에는 쓰지 않는다 - 다음 실제 변경 시 함께 저장됨
+    reset_recurring_goals(goals, today_str)
+    index = build_goal_index(goals)
+    _goal_index_cache[path] = (mtime, today_str, goals, index)
+    while len(_goal_index_cache) > GOAL_INDEX_CACHE_SIZE:
+        _goal_index_cache.popitem(last=False)
+    return ([dict(goal) for goal in goals] if copy else goals), index
+
+def goals_in_range(goals, index, start=None, end=None):
+    """마감일이 [start, end) 범위인 목표 목록 (start/end는 YYYY-MM-DD)"""
+    deadlines = index['deadlines']
+    lo = bisect.bisect_left(deadlines, start) if start else 0
+    hi = bisect.bisect_left(deadlines, end) if end else len(deadlines)
+    return [goals[i] for i in index['deadline_goals'][lo:hi]]
+
+def find_goal(goals, index, goal_id):
+    """id로 목표 조회 (O(1)). 없으면 None"""
+    i = index['by_id'].get(goal_id)
+    return goals[i] if i is not None else None
+
+# --- 목표 변경 헬퍼 ---
+def new_goal(text, deadline=None, is_recurring=False):
+    """새 목표 생성"""
+    goal = {'id': str(uuid.uuid4()), 'text': text, 'status': 'In Progress'}
+    if is_recurring:
+        goal['type'] = 'recurring'
+        goal['last_completed'] = None
+    if deadline:
+        goal['deadline'] = deadline
+    return goal
+
+def toggle_goal(goal, player_data, today_str):
+    """목표 완료/취소 토글 및 경험치 반영. 티켓 변화량 반환 (원장 반영은 호출하는 쪽에서)"""
+    if goal['status'] == 'In Progress':
+        goal['status'] = 'Completed'
+        player_data['exp'] += 10  # MMORPG 경험치 추가
+        if goal.get('type') == 'recurring':
+            goal['last_completed'] = today_str
+        else:
+            goal['completion_date'] = today_str
+        return 1
+    if goal.get('type') != 'recurring':
+        goal['status'] = 'In Progress'
+        if 'completion_date' in goal:
+            del goal['completion_date']
+        return -1
+    return 0
+
+def default_player_data():
+    return {'tickets': 0, 'score': 0, 'items': [], 'equipped_badge': None, 'level': 1, 'exp': 0, 'hp': 100}
+
+def load_player_data_file(path):
+    player_data = load_data(path, default_player_data())
+    for key, value in default_player_data().items():
+        if key not in player_data:
+            player_data[key] = value
+    return player_data
+
+def merge_holdings(player_data, holdings):
+    """원장의 잔액과 소유 아이템을 플레이어 데이터에 반영 (원장 도입 전에 파일에만 있던 아이템도 유지)"""
+    items = holdings.pop('items')
+    player_data.update(holdings)
+    player_data['items'] = player_data['items'] + [item for item in items if item not in player_data['items']]
 
 def load_user_player_data():
     path = get_user_data_path('player')
     if path:
-        default_player_data = {'tickets': 0, 'score': 0, 'items': [], 'equipped_badge': None, 'last_login_date': None, 'level': 1, 'exp': 0, 'hp': 100}
-        player_data = load_data(path, default_player_data)
-        for key, value in default_player_data.items():
-            if key not in player_data:
-                player_data[key] = value
+        player_data = load_player_data_file(path)
+        # 티켓/점수와 구매한 아이템은 재화 원장이 기준
+        merge_holdings(player_data, currency.holdings(session['username']))
         return player_data
-    return {'tickets': 0, 'score': 0, 'items': [], 'equipped_badge': None, 'last_login_date': None, 'level': 1, 'exp': 0, 'hp': 100}
+    return default_player_data()
+
+# --- 목표 집계 (프로필/대시보드) ---
+def empty_goal_stats():
+    # completions: 최근 STATS_CHART_DAYS일의 날짜별 완료 수 (completion_date 기준)
+    # recurring_done: 오늘 완료한 반복 목표 수 (last_completed 기준, 날짜가 바뀌면 자연히 0)
+    return {'total_goals': 0, 'completed_goals': 0, 'completions': {}, 'recurring_done': {}}
+
+def _bump(counts, key, sign):
+    value = counts.get(key, 0) + sign
+    if value > 0:
+        counts[key] = value
+    else:
+        counts.pop(key, None)
+
+def track_goal(stats, goal, sign):
+    """목표 하나의 기여분을 집계에 더하거나 (sign=1) 뺀다 (sign=-1)"""
+    stats['total_goals'] += sign
+    if goal.get('completion_date'):
+        _bump(stats['completions'], goal['completion_date'], sign)
+    if goal.get('status') != 'Completed':
+        return
+    if goal.get('type') == 'recurring':
+        if goal.get('last_completed'):
+            _bump(stats['recurring_done'], goal['last_completed'], sign)
+    else:
+        stats['completed_goals'] += sign
+
+def track_goal_change(stats, before, after):
+    """목표 변경 반영 (추가는 before=None, 삭제는 after=None)"""
+    if before is not None:
+        track_goal(stats, before, -1)
+    if after is not None:
+        track_goal(stats, after, 1)
+
+def prune_goal_stats(stats, today_str):
+    """차트 범위를 벗어난 날짜별 카운터 정리 (파일 크기가 목표 수와 무관하게 유지된다)"""
+    first_day = str(date.fromisoformat(today_str) - timedelta(days=STATS_CHART_DAYS - 1))
+    stats['completions'] = {day: n for day, n in stats['completions'].items() if first_day <= day <= today_str}
+    stats['recurring_done'] = {day: n for day, n in stats['recurring_done'].items() if day == today_str}
+    return stats
+
+def build_goal_stats(goals, today_str):
+    """목표 목록 전체를 훑어서 집계 생성 (재구성/검사용)"""
+    stats = empty_goal_stats()
+    for goal in goals:
+        track_goal(stats, goal, 1)
+    return prune_goal_stats(stats, today_str)
+
+def load_goal_stats(username, today_str):
+    """저장된 목표 집계. 없으면 (이전 버전 데이터) 목표 파일로 한 번 만들어서 저장"""
+    path = user_data_path(username, 'stats')
+    stats = load_data(path, None)
+    if stats is None:
+        goals = load_data(user_data_path(username, 'goals'), [])
+        reset_recurring_goals(goals, today_str)
+        stats = build_goal_stats(goals, today_str)
+        save_data(stats, path)
+    return stats
+
+def save_goal_stats(username, stats, today_str):
+    save_data(prune_goal_stats(stats, today_str), user_data_path(username, 'stats'))
+
+def load_user_goal_stats():
+    return load_goal_stats(session['username'], str(date.today()))
+
+def goal_stats_view(stats, today_str):
+    """화면용 통계와 최근 STATS_CHART_DAYS일 완료 차트 (목표 수와 무관하게 O(1))"""
+    total_goals = stats['total_goals']
+    completed_goals = stats['completed_goals'] + stats['recurring_done'].get(today_str, 0)
+    today = date.fromisoformat(today_str)
+    days = [today - timedelta(days=i) for i in range(STATS_CHART_DAYS - 1, -1, -1)]
+    return {
+        'total_goals': total_goals,
+        'completed_goals': completed_goals,
+        'completion_rate': int((completed_goals / total_goals) * 100) if total_goals > 0 else 0,
+        'chart_labels': [day.strftime('%m/%d') for day in days],
+        'chart_data': [stats['completions'].get(str(day), 0) for day in days]
+    }
+
+def check_goal_stats(username, today_str):
+    """저장된 집계가 목표 파일과 맞는지 확인. (상태, 다시 계산한 집계)
+
+    상태는 'ok', 'missing' (집계 파일이 아직 없음 - 손상이 아니라 만들기만 하면 된다), 'mismatch' 중 하나.
+    """
+    goals = load_data(user_data_path(username, 'goals'), [])
+    reset_recurring_goals(goals, today_str)
+    expected = build_goal_stats(goals, today_str)
+    stored = load_data(user_data_path(username, 'stats'), None)
+    if stored is None:
+        return 'missing', expected
+    return ('ok' if prune_goal_stats(stored, today_str) == expected else 'mismatch'), expected
+
+# --- 재화 (티켓/점수) 원장 ---
+currency = CurrencyLedger(
+    path_for=lambda username: user_data_path(username, 'ledger').replace('.json', '.ndjson'),
+    initial_balances=lambda username: load_data(user_data_path(username, 'player'), {})
+)
+
+def change_balance(deltas, reason, key=None, clamp=False, grant=None):
+    """현재 로그인한 유저의 재화 변경 (grant: 같은 기록으로 소유를 남길 아이템)"""
+    return currency.apply(session['username'], deltas, reason, key=key, clamp=clamp, grant=grant)
+
+def request_idempotency_key(scope):
+    """클라이언트가 재시도해도 한 번만 지급되도록 Idempotency-Key 헤더를 멱등 키로 사용"""
+    key = request.headers.get('Idempotency-Key')
+    return f'{scope}:{key}' if key else None
 
 def save_user_player_data(player_data):
     path = get_user_data_path('player')
     if path: save_data(player_data, path)
 
 # --- MMORPG 게임 함수들 ---
+def on_monster_spawned(monster_id, monster):
+    event_log.append('spawn', k='monster', id=monster_id, d=monster)
+    add_monster_to_ai(monster_id)
+
+def on_item_spawned(item_id, item):
+    event_log.append('spawn', k='item', id=item_id, d=item)
+    item_grid.insert(item_id, item['x'], item['y'])
+
+# 스폰 테이블 (종류, 지역 가중치, 상한, 리스폰 지연) 은 spawn_tables.json에서 읽는다
+monster_spawner = None
+item_spawner = None
+
+def is_open_position(x, y):
+    return not world_map.is_blocked(x, y)
+
+def random_open_position(x_range, y_range):
+    """장애물이 아닌 임의 위치"""
+    while True:
+        x, y = world_rng.randint(*x_range), world_rng.randint(*y_range)
+        if is_open_position(x, y):
+            return {'x': x, 'y': y}
+
 def spawn_monsters():
-    """몬스터 생성"""
-    # 일반 몬스터 5마리 유지
-    normal_monsters = [m for m in game_world['monsters'].values() if m.get('monster_type') != 'boss']
-    while len(normal_monsters) < 5:
-        monster_id = str(uuid.uuid4())
-        game_world['monsters'][monster_id] = {
-            'x': random.randint(50, 750),
-            'y': random.randint(50, 550),
-            'hp': 30,
-            'max_hp': 30,
-            'type': random.choice(['👹', '👾', '🤖']),
-            'monster_type': 'normal',
-            'target_player': None,  # 타겟 플레이어
-            'detection_range': 150,  # 감지 범위 (넓혀짐)
-            'attack_range': 40,  # 공격 범위
-            'move_speed': 4.0,  # 이동 속도 (더 빠르게)
-            'last_move': 0,  # 마지막 이동 시간
-            'last_attack': 0  # 마지막 공격 시간
-        }
-        normal_monsters.append(game_world['monsters'][monster_id])
-    
-    # 보스 몬스터 1마리 유지
-    boss_monsters = [m for m in game_world['monsters'].values() if m.get('monster_type') == 'boss']
-    if len(boss_monsters) < 1:
-        spawn_boss_monster()
-
-def spawn_boss_monster():
-    """보스 몬스터 생성"""
-    boss_id = str(uuid.uuid4())
-    game_world['monsters'][boss_id] = {
-        'x': random.randint(100, 700),
-        'y': random.randint(100, 500),
-        'hp': 150,
-        'max_hp': 150,
-        'type': '🐲',  # 드래곤 보스
-        'monster_type': 'boss',
-        'last_attack': 0,
-        'attack_pattern': 0,
-        'target_player': None,  # 타겟 플레이어
-        'detection_range': 200,  # 감지 범위 (더 넓게)
-        'attack_range': 60,  # 공격 범위
-        'move_speed': 5.0,  # 이동 속도 (플레이어보다 더 빠르게)
-        'last_move': 0  # 마지막 이동 시간
-    }
+    """몬스터 생성 (리스폰 시각이 된 빈 자리만 채운다)"""
+    return monster_spawner.tick()
 
 def spawn_items():
-    """아이템 생성"""
-    if len(game_world['items']) < 3:
-        item_id = str(uuid.uuid4())
-        game_world['items'][item_id] = {
-            'x': random.randint(50, 750),
-            'y': random.randint(50, 550),
-            'type': random.choice(['💎', '⚔️', '🛡️', '💰'])
-        }
+    """아이템 생성 (리스폰 시각이 된 빈 자리만 채운다)"""
+    return item_spawner.tick()
+
+# --- 세션 인덱스 ---
+def register_session(username, session_id):
+    """유저의 현재 세션 등록. 이전 세션 id가 있으면 반환"""
+    old_session_id = user_sessions.get(username)
+    user_sessions[username] = session_id
+    session_users[session_id] = username
+    return old_session_id if old_session_id != session_id else None
+
+def unregister_session(session_id):
+    """세션 제거 (더 최신 세션이 등록돼 있으면 유저 인덱스는 유지)"""
+    username = session_users.pop(session_id, None)
+    if username is not None and user_sessions.get(username) == session_id:
+        del user_sessions[username]
+    return username
+
+def get_user_session(username):
+    return user_sessions.get(username)
+
+def emit_to_user(username, event, data):
+    """세션 id 대신 유저 이름으로 이벤트 전송. 접속 중이 아니면 False"""
+    session_id = user_sessions.get(username)
+    if session_id is None:
+        return False
+    event_sink(event, data, room=session_id)
+    return True
 
 # --- 듀얼 시스템 함수들 ---
 def create_duel_request(from_player_id, to_player_id):
@@ -150,110 +557,215 @@ def create_duel_request(from_player_id, to_player_id):
     game_world['duel_requests'][request_id] = {
         'from_player': from_player_id,
         'to_player': to_player_id,
-        'timestamp': date.today().isoformat(),
+        'timestamp': world_clock(),
         'from_username': game_world['players'][from_player_id]['username'],
         'to_username': game_world['players'][to_player_id]['username']
     }
     return request_id
 
+def duel_room(duel_id):
+    return f'duel_{duel_id}'
+
+def world_state():
+    """월드 전체 상태 (듀얼 인스턴스 안의 플레이어는 제외)"""
+    return {
+        'players': {player_id: player for player_id, player in game_world['players'].items() if not player.get('in_duel')},
+        'monsters': game_world['monsters'],
+        'items': game_world['items'],
+        'duels': game_world['duels']
+    }
+
+def duel_state(duel_id):
+    """듀얼 인스턴스 상태 (참가자만 포함)"""
+    duel = game_world['duels'][duel_id]
+    players = {player_id: game_world['players'][player_id]
+               for player_id in (duel['player1_id'], duel['player2_id']) if player_id in game_world['players']}
+    return {'duel_id': duel_id, 'players': players, 'monsters': {}, 'items': {}, 'duels': {duel_id: duel}}
+
 def accept_duel_request(request_id):
-    """듀얼 신청 수락"""
-    if request_id not in game_world['duel_requests']:
+    """듀얼 신청 수락 - 빈 아레나를 할당해 두 플레이어를 인스턴스로 옮긴다"""
+    if request_id not in game_world['duel_requests'] or not free_arenas:
         return False
     
     request = game_world['duel_requests'][request_id]
     player1_id = request['from_player']
     player2_id = request['to_player']
+    if any(game_world['players'][player_id].get('in_duel') for player_id in (player1_id, player2_id)):
+        return False
     
     # 듀얼 생성
     duel_id = str(uuid.uuid4())
-    game_world['duels'][duel_id] = {
+    room = duel_room(duel_id)
+    duel = {
         'player1_id': player1_id,
         'player2_id': player2_id,
         'status': 'active',
-        'arena_pos': {'x': 400, 'y': 300},  # 아레나 중앙
-        'start_time': date.today().isoformat()
+        'arena_id': free_arenas.pop(),
+        'arena_pos': {'x': 400, 'y': 300},  # 아레나 중앙 (인스턴스 좌표)
+        'start_time': world_clock(),
+        'world_pos': {},  # 듀얼 종료 후 돌아갈 월드 좌표
+        'spectators': [],
+        'dirty': False  # 다음 인스턴스 틱에 상태 동기화 필요 여부
     }
+    game_world['duels'][duel_id] = duel
     
-    # 플레이어들을 아레나로 이동
-    game_world['players'][player1_id]['x'] = 350
-    game_world['players'][player1_id]['y'] = 300
-    game_world['players'][player1_id]['in_duel'] = duel_id
+    # 플레이어들을 월드 방에서 빼서 아레나 인스턴스로 이동
+    for player_id, start_pos in zip((player1_id, player2_id), DUEL_START_POSITIONS):
+        player = game_world['players'][player_id]
+        duel['world_pos'][player_id] = {'x': player['x'], 'y': player['y']}
+        player['x'] = start_pos['x']
+        player['y'] = start_pos['y']
+        player['in_duel'] = duel_id
+        player_grid.remove(player_id)
+        outbound.discard(player_id)  # 아직 못 보낸 월드 메시지는 아레나에서는 필요 없다
+        socketio.server.leave_room(player_id, 'game_world', namespace='/')
+        socketio.server.enter_room(player_id, room, namespace='/')
     
-    game_world['players'][player2_id]['x'] = 450
-    game_world['players'][player2_id]['y'] = 300
-    game_world['players'][player2_id]['in_duel'] = duel_id
+    event_log.append('duel_start', id=duel_id,
+                     players=[game_world['players'][player_id]['username'] for player_id in (player1_id, player2_id)],
+                     world_pos={game_world['players'][player_id]['username']: pos for player_id, pos in duel['world_pos'].items()})
     
-    # 요청 삭제
-    del game_world['duel_requests'][request_id]
+    # 이 요청과 함께 두 플레이어가 관련된 다른 대기 중인 요청도 삭제
+    for other_id in [other_id for other_id, other in game_world['duel_requests'].items()
+                     if {other['from_player'], other['to_player']} & {player1_id, player2_id}]:
+        del game_world['duel_requests'][other_id]
     return duel_id
 
 def end_duel(duel_id, winner_id=None):
-    """듀얼 종료"""
-    if duel_id not in game_world['duels']:
+    """듀얼 종료 - 인스턴스를 정리하고 참가자들을 원래 월드 위치로 복귀"""
+    duel = game_world['duels'].pop(duel_id, None)
+    if not duel:
         return False
     
-    duel = game_world['duels'][duel_id]
-    player1_id = duel['player1_id']
-    player2_id = duel['player2_id']
+    room = duel_room(duel_id)
+    returning = {}
+    for player_id in (duel['player1_id'], duel['player2_id']):
+        player = game_world['players'].get(player_id)
+        if not player:
+            continue
+        # 플레이어 듀얼 상태 해제
+        player.pop('in_duel', None)
+        player['hp'] = 100  # HP 회복
+        player.update(duel['world_pos'][player_id])
+        update_player_position(player_id, player['x'], player['y'])
+        socketio.server.leave_room(player_id, room, namespace='/')
+        socketio.server.enter_room(player_id, 'game_world', namespace='/')
+        returning[player_id] = player
     
-    # 플레이어들 듀얼 상태 해제
-    if player1_id in game_world['players']:
-        game_world['players'][player1_id].pop('in_duel', None)
-        game_world['players'][player1_id]['hp'] = 100  # HP 회복
+    for spectator_id in duel['spectators']:
+        socketio.server.leave_room(spectator_id, room, namespace='/')
+        if spectator_id in game_world['players']:
+            game_world['players'][spectator_id].pop('spectating', None)
     
-    if player2_id in game_world['players']:
-        game_world['players'][player2_id].pop('in_duel', None)
-        game_world['players'][player2_id]['hp'] = 100  # HP 회복
+    free_arenas.append(duel['arena_id'])
+    event_log.append('duel_end', id=duel_id,
+                     winner=game_world['players'][winner_id]['username'] if winner_id in game_world['players'] else None)
     
-    # 듀얼 삭제
-    del game_world['duels'][duel_id]
+    # 복귀한 플레이어에게는 월드 상태를, 나머지에게는 복귀 알림만 전송
+    state = world_state()
+    for player_id in returning:
+        event_sink('game_state', state, room=player_id)
+    event_sink('duel_instance_closed', {'duel_id': duel_id, 'players': returning},
+               room='game_world', skip_sid=list(returning))
     return True
 
+def tick_duel(duel_id, now):
+    """듀얼 인스턴스 하나의 틱 - 제한 시간 확인 및 방 안에만 상태 동기화"""
+    duel = game_world['duels'][duel_id]
+    if now - duel['start_time'] > DUEL_TIMEOUT:
+        event_sink('duel_ended', {'winner': None, 'loser': None, 'result': 'draw'}, room=duel_room(duel_id))
+        end_duel(duel_id)
+    elif duel['dirty']:
+        duel['dirty'] = False
+        event_sink('duel_state', duel_state(duel_id), room=duel_room(duel_id))
+
 # --- 몬스터 AI 시스템 ---
+def add_monster_to_ai(monster_id):
+    """몬스터를 AI 격자에 등록. 근처에 플레이어가 있으면 바로 깨운다"""
+    monster = game_world['monsters'][monster_id]
+    monster_grid.insert(monster_id, monster['x'], monster['y'])
+    if player_grid.query_radius(monster['x'], monster['y'], AI_WAKE_RADIUS):
+        awake_monsters[monster_id] = 0
+
+def remove_monster_from_ai(monster_id):
+    monster_grid.remove(monster_id)
+    awake_monsters.pop(monster_id, None)
+
+def wake_monsters_near(x, y):
+    """플레이어 이동/입장 시 주변 휴면 몬스터를 깨운다"""
+    for monster_id, _ in monster_grid.query_radius(x, y, AI_WAKE_RADIUS):
+        awake_monsters.setdefault(monster_id, 0)
+
+def update_player_position(session_id, x, y):
+    """월드 플레이어 위치를 격자에 반영하고 주변 몬스터를 깨운다"""
+    player_grid.move(session_id, x, y)
+    wake_monsters_near(x, y)
+
 def update_monster_ai():
-    """몬스터 AI 업데이트"""
-    import time
-    current_time = time.time()
+    """몬스터 AI 업데이트 - 깨어 있는 몬스터만 처리한다.
+
+    주변에 플레이어가 없으면 휴면, 감지 범위 밖이면 AI_FAR_INTERVAL 주기로만, 교전 중이면 매 틱 갱신.
+    """
+    current_time = world_clock()
+    flow_fields.start_tick(current_time)
     
-    for monster_id, monster in game_world['monsters'].items():
-        # 가장 가까운 플레이어 찾기
-        closest_player = None
-        closest_distance = float('inf')
+    for monster_id, next_think in list(awake_monsters.items()):
+        if current_time < next_think:
+            continue
+        monster = game_world['monsters'].get(monster_id)
+        if monster is None:
+            awake_monsters.pop(monster_id, None)
+            continue
         
-        for player_id, player in game_world['players'].items():
-            # 듀얼 중인 플레이어는 제외
-            if player.get('in_duel'):
-                continue
-                
-            distance = ((monster['x'] - player['x']) ** 2 + (monster['y'] - player['y']) ** 2) ** 0.5
-            
-            if distance < closest_distance:
-                closest_distance = distance
-                closest_player = {'id': player_id, 'data': player}
+        # 가장 가까운 플레이어 찾기 (격자 주변 칸만 조회, 듀얼 중인 플레이어는 격자에 없음)
+        closest_player_id, closest_distance = player_grid.nearest(monster['x'], monster['y'], AI_WAKE_RADIUS)
+        
+        if closest_player_id is None:
+            # 휴면 - 플레이어가 다가오면 wake_monsters_near에서 다시 깨운다
+            monster['target_player'] = None
+            del awake_monsters[monster_id]
+            continue
         
         # 감지 범위 내에 플레이어가 있는지 확인
-        if closest_player and closest_distance <= monster['detection_range']:
-            monster['target_player'] = closest_player['id']
+        if closest_distance <= monster['detection_range']:
+            monster['target_player'] = closest_player_id
+            awake_monsters[monster_id] = current_time  # 교전 중 - 매 틱 갱신
             
             # 공격 범위 내라면 공격
             if closest_distance <= monster['attack_range']:
                 if current_time - monster.get('last_attack', 0) > 2.0:  # 2초 쿨다운
-                    attack_player(monster_id, closest_player['id'])
+                    attack_player(monster_id, closest_player_id)
                     monster['last_attack'] = current_time
             else:
                 # 추적 이동
                 if current_time - monster.get('last_move', 0) > 0.016:  # 약 60fps로 이동 (매우 부드럽게)
-                    move_monster_towards_player(monster, closest_player['data'])
+                    move_monster_towards_player(monster, closest_player_id, game_world['players'][closest_player_id])
                     monster['last_move'] = current_time
+                    monster_grid.move(monster_id, monster['x'], monster['y'])
+                    event_log.record_move('m', monster_id, monster['x'], monster['y'])
         else:
-            # 타겟 해제
+            # 타겟 해제, 근처에는 있으므로 낮은 주기로만 확인
             monster['target_player'] = None
-
-def move_monster_towards_player(monster, player):
-    """몬스터가 플레이어 쪽으로 이동"""
-    dx = player['x'] - monster['x']
-    dy = player['y'] - monster['y']
+            awake_monsters[monster_id] = current_time + AI_FAR_INTERVAL
+
+def move_monster_towards_player(monster, player_id, player):
+    """몬스터가 플레이어 쪽으로 이동 (장애물은 플레이어 칸 기준 공유 플로우 필드를 따라 우회)"""
+    monster_cell = world_map.cell_of(monster['x'], monster['y'])
+    player_cell = world_map.cell_of(player['x'], player['y'])
+    if monster_cell == player_cell or player_cell in world_map.passable_neighbors(*monster_cell):
+        goal_x, goal_y = player['x'], player['y']  # 바로 옆 칸이면 직선으로 접근
+    else:
+        field = flow_fields.field_for(player_id, player['x'], player['y'])
+        if field is None:
+            goal_x, goal_y = player['x'], player['y']  # 이번 틱 경로 계산 예산 소진 - 직선으로 (장애물에서는 미끄러짐)
+        else:
+            next_cell = field.next_cell(monster_cell)
+            if next_cell is None:
+                return  # 갈 수 있는 길이 없음
+            goal_x, goal_y = world_map.cell_center(next_cell)
+    
+    dx = goal_x - monster['x']
+    dy = goal_y - monster['y']
     
     # 정규화
     distance = (dx ** 2 + dy ** 2) ** 0.5
@@ -263,12 +775,16 @@ def move_monster_towards_player(monster, player):
         
         # 이동 (프레임당 이동량을 작게 하여 부드럽게)
         frame_speed = monster['move_speed'] * 0.3  # 프레임당 실제 이동량
-        monster['x'] += dx * frame_speed
-        monster['y'] += dy * frame_speed
+        new_x = max(25, min(775, monster['x'] + dx * frame_speed))
+        new_y = max(25, min(575, monster['y'] + dy * frame_speed))
         
-        # 경계 체크
-        monster['x'] = max(25, min(775, monster['x']))
-        monster['y'] = max(25, min(575, monster['y']))
+        # 장애물에 막히면 축 하나씩 미끄러지듯 이동
+        if not world_map.is_blocked(new_x, new_y):
+            monster['x'], monster['y'] = new_x, new_y
+        elif not world_map.is_blocked(new_x, monster['y']):
+            monster['x'] = new_x
+        elif not world_map.is_blocked(monster['x'], new_y):
+            monster['y'] = new_y
 
 def attack_player(monster_id, player_id):
     """몬스터가 플레이어를 공격"""
@@ -280,17 +796,18 @@ def attack_player(monster_id, player_id):
     
     # 데미지 계산
     if monster.get('monster_type') == 'boss':
-        damage = random.randint(8, 15)
+        damage = world_rng.randint(8, 15)
     else:
-        damage = random.randint(3, 8)
+        damage = world_rng.randint(3, 8)
     
     # 플레이어 HP 감소
     player['hp'] -= damage
     if player['hp'] < 0:
         player['hp'] = 0
+    event_log.append('damage', k='player', id=player['username'], by=monster_id, dmg=damage, hp=player['hp'])
     
     # 몬스터 공격 이벤트 발생
-    socketio.emit('player_damaged_by_monster', {
+    event_sink('player_damaged_by_monster', {
         'player_id': player_id,
         'monster_id': monster_id,
         'monster_type': monster['type'],
@@ -298,61 +815,420 @@ def attack_player(monster_id, player_id):
         'hp': player['hp']
     }, room='game_world')
 
-# 게임 초기화
-spawn_monsters()
-spawn_items()
+def world_snapshot():
+    """스냅샷용 월드 상태 (플레이어 위치는 유저 이름 기준)"""
+    positions = dict(last_positions)
+    for player in game_world['players'].values():
+        if not player.get('in_duel'):
+            positions[player['username']] = {'x': player['x'], 'y': player['y']}
+    for duel in game_world['duels'].values():
+        for player_id, pos in duel['world_pos'].items():
+            if player_id in game_world['players']:
+                positions[game_world['players'][player_id]['username']] = pos
+    return {'monsters': game_world['monsters'], 'items': game_world['items'], 'positions': positions, 'duels': {}}
+
+def recover_world():
+    """스냅샷 + 이벤트 로그로 몬스터/아이템/플레이어 위치 복구"""
+    state = event_log.recover()
+    if state:
+        game_world['monsters'].update(state['monsters'])
+        for monster_id, monster in state['monsters'].items():
+            monster_spawner.adopt(monster_id, monster.get('monster_type', 'normal'))
+            add_monster_to_ai(monster_id)
+        game_world['items'].update(state['items'])
+        for item_id, item in state['items'].items():
+            item_spawner.adopt(item_id, 'item')
+            item_grid.insert(item_id, item['x'], item['y'])
+        last_positions.update(state['positions'])
+        # 재시작으로 끊긴 듀얼의 참가자는 듀얼 전 위치로 돌려보낸다
+        for duel in state['duels'].values():
+            last_positions.update(duel['world_pos'])
+
+# --- 게임 서버 (월드 상태와 틱 루프) ---
+game_server = {
+    'world_ready': False,
+    'loop_running': False,
+    'max_buffered_packets': TRANSPORT_PROFILES['websocket']['max_buffered_packets'],
+    'dropped_slow_consumers': 0
+}
+
+def init_game_world(log_path=WORLD_EVENT_LOG, snapshot_path=WORLD_SNAPSHOT_FILE):
+    """게임 월드를 새로 만들고 스냅샷/이벤트 로그에서 복구한 뒤 빈 자리를 채운다"""
+    global game_world, event_log, world_map, flow_fields, monster_grid, player_grid
+    global monster_spawner, item_spawner, free_arenas, item_grid, combat
+    game_world = {
+        'players': {},  # {session_id: {username, x, y, level, exp, hp, last_seen}}
+        'monsters': {},  # {monster_id: {x, y, hp, type}}
+        'items': {},  # {item_id: {x, y, type}}
+        'duels': {},  # {duel_id: {player1_id, player2_id, status, arena_pos}}
+        'duel_requests': {}  # {request_id: {from_player, to_player, timestamp}}
+    }
+    event_log = EventLog(log_path, snapshot_path)
+    world_map = get_world_map()
+    flow_fields = FlowFieldCache(world_map)
+    monster_grid = SpatialGrid(AI_WAKE_RADIUS)
+    player_grid = SpatialGrid(AI_WAKE_RADIUS)
+    item_grid = SpatialGrid(ITEM_COLLECT_RANGE)
+    combat = CombatGuard(ACTION_COOLDOWNS, COMBAT_MAX_REJECTIONS, MOVE_SPEED_LIMIT, MOVE_BURST)
+    free_arenas = list(range(DUEL_ARENA_SLOTS))
+    for index in (last_positions, awake_monsters, user_sessions, session_users):
+        index.clear()
+    spawn_tables = load_spawn_tables(SPAWN_TABLES_FILE)
+    monster_spawner = Spawner(spawn_tables['monsters'], spawn_tables['regions'], game_world['monsters'], 'm',
+                              on_spawn=on_monster_spawned, can_place=is_open_position, rng=world_rng, clock=world_clock)
+    item_spawner = Spawner(spawn_tables['items'], spawn_tables['regions'], game_world['items'], 'i',
+                           on_spawn=on_item_spawned, can_place=is_open_position, rng=world_rng, clock=world_clock)
+    recover_world()
+    monster_spawner.fill()
+    item_spawner.fill()
+    game_server['world_ready'] = True
+
+def ensure_game_world():
+    if not game_server['world_ready']:
+        init_game_world()
+
+def start_game_server():
+    """월드를 (아직 없으면) 만들고 월드 틱 루프를 백그라운드로 시작"""
+    ensure_game_world()
+    if not game_server['loop_running']:
+        game_server['loop_running'] = True
+        socketio.start_background_task(game_scheduler.run_forever, socketio.sleep)
+
+# --- 예약 작업 ---
+scheduler = Scheduler(tick=0.25)  # 저장소 유지보수 작업 (웹 전용 프로세스에서도 실행)
+game_scheduler = Scheduler(tick=0.25)  # 월드 틱 (게임 서버에서만 실행)
+
+@scheduler.job(daily=True, run_at_start=True)
+def daily_rewards():
+    """전체 유저에게 일일 보너스 티켓 지급 (지급 여부는 원장의 daily:<날짜> 키로 남는다)"""
+    today_str = str(date.today())
+    for usernames in iter_username_batches():
+        for username in usernames:
+            currency.apply(username, {'tickets': DAILY_LOGIN_REWARD}, 'daily_bonus', key=f'daily:{today_str}', cache=False)
+        socketio.sleep(0)
+
+@game_scheduler.job(interval=10)
+def expire_duel_requests():
+    """오래된 듀얼 신청 삭제 및 신청자에게 알림"""
+    now = world_clock()
+    expired = [request_id for request_id, duel_request in game_world['duel_requests'].items()
+               if now - duel_request['timestamp'] > DUEL_REQUEST_TTL]
+    for request_id in expired:
+        duel_request = game_world['duel_requests'].pop(request_id)
+        event_sink('duel_error', {'message': '듀얼 요청이 만료되었습니다.'}, room=duel_request['from_player'])
+
+@scheduler.job(interval=3600)
+def compact_storage():
+    """오늘 날짜가 아닌 (더 이상 유효하지 않은) 목표 인덱스 캐시 정리, 재화 원장 압축"""
+    today_str = str(date.today())
+    for path in [path for path, cached in _goal_index_cache.items() if cached[1] != today_str]:
+        del _goal_index_cache[path]
+    for batch in iter_username_batches():
+        for username in batch:
+            balances = currency.compact(username)
+            if balances is None:
+                continue
+            # 플레이어 파일의 티켓/점수도 원장 잔액으로 맞춰 둔다 (읽기 전용 사본)
+            path = user_data_path(username, 'player')
+            player_data = load_player_data_file(path)
+            player_data.update(balances)
+            save_data(player_data, path)
+
+def transport_queue_depth(session_id):
+    """클라이언트의 Engine.IO 송신 대기열에 쌓인 패킷 수 (연결을 찾을 수 없으면 0)"""
+    try:
+        eio_sid = socketio.server.manager.eio_sid_from_sid(session_id, '/')
+        eio_socket = socketio.server.eio.sockets.get(eio_sid)
+    except (AttributeError, KeyError):
+        return 0
+    return eio_socket.queue.qsize() if eio_socket else 0
+
+def drop_client(session_id):
+    """연결 종료 (disconnect 핸들러가 월드에서 플레이어를 정리한다)"""
+    game_server['dropped_slow_consumers'] += 1
+    socketio.server.disconnect(session_id, namespace='/')
+
+@game_scheduler.job(interval=1)
+def drop_slow_consumers():
+    """송신 대기열이 한도를 넘은 (따라오지 못하는) 클라이언트 연결 종료"""
+    limit = game_server['max_buffered_packets']
+    for session_id in list(game_world['players']):
+        if transport_queue_depth(session_id) > limit:
+            drop_client(session_id)
+
+@game_scheduler.job(interval=COMBAT_WINDOW)
+def drop_abusive_clients():
+    """거부된 행동 (범위 밖 공격, 쿨다운 무시, 클라이언트 데미지 주장) 이 너무 많은 클라이언트 연결 종료"""
+    for session_id in combat.end_window():
+        if session_id in game_world['players']:
+            socketio.server.disconnect(session_id, namespace='/')
+
+@game_scheduler.job(interval=OUTBOUND_FLUSH_INTERVAL)
+def flush_outbound():
+    """느린 클라이언트 목록 갱신, 다시 따라온 클라이언트에게 모아 둔 메시지 전송"""
+    outbound.flush(list(game_world['players']), transport_queue_depth,
+                   lambda session_id, event, data: socketio.emit(event, data, to=session_id), drop_client)
+
+@game_scheduler.job(interval=DUEL_TICK_INTERVAL)
+def tick_duels():
+    """진행 중인 듀얼 인스턴스들의 미니 틱"""
+    now = world_clock()
+    for duel_id in list(game_world['duels']):
+        tick_duel(duel_id, now)
+
+@game_scheduler.job(interval=1)
+def respawn_entities():
+    """리스폰 지연이 끝난 몬스터/아이템 생성"""
+    spawn_monsters()
+    spawn_items()
+
+@game_scheduler.job(interval=1)
+def flush_event_log():
+    """모아 둔 월드 이벤트 (이동 배치 포함) 를 로그 파일에 기록"""
+    event_log.flush()
+
+@game_scheduler.job(interval=WORLD_SNAPSHOT_INTERVAL)
+def snapshot_world():
+    """월드 스냅샷 저장 및 이벤트 로그 조각 정리"""
+    event_log.snapshot(world_snapshot())
+
+@scheduler.job(interval=3600)
+def prune_sessions():
+    """만료된 서버 측 세션 삭제"""
+    session_store.prune()
+
+@main.cli.command('run-job')
+@click.argument('name')
+def run_job_command(name):
+    """예약 작업을 즉시 한 번 실행 (예: flask run-job daily_rewards)"""
+    if name in game_scheduler.jobs:
+        ensure_game_world()
+        stats = game_scheduler.trigger(name)
+    elif name in scheduler.jobs:
+        stats = scheduler.trigger(name)
+    else:
+        raise click.BadParameter(f"Unknown job. Available: {', '.join([*scheduler.jobs, *game_scheduler.jobs])}")
+    click.echo(f"{name}: {stats['last_duration'] * 1000:.1f} ms, errors={stats['errors']}")
+
+maintenance = {'running': False}
+
+def start_scheduler():
+    """유지보수 스케줄러를 백그라운드 태스크로 시작 (이미 돌고 있으면 그대로)"""
+    if not maintenance['running']:
+        maintenance['running'] = True
+        socketio.start_background_task(scheduler.run_forever, socketio.sleep)
+
+@main.before_app_request
+def ensure_maintenance_jobs():
+    """create_app으로 띄운 워커에서도 첫 요청 때 유지보수 작업을 시작"""
+    if current_app.config['MAINTENANCE_JOBS']:
+        start_scheduler()
+
+# --- 유저 데이터 내보내기/가져오기 ---
+def load_user_record(item):
+    """유저 한 명의 내보내기 레코드 (계정, 플레이어 데이터, 목표)"""
+    username, password_hash = item
+    player_data = load_player_data_file(user_data_path(username, 'player'))
+    merge_holdings(player_data, currency.holdings(username, cache=False))
+    return {'username': username, 'password_hash': password_hash, 'player': player_data,
+            'goals': load_data(user_data_path(username, 'goals'), [])}
+
+def iter_user_records(workers=EXPORT_WORKERS):
+    """전체 유저 레코드를 하나씩 반환 (파일 읽기는 스레드 풀에서, 한 번에 일부만 메모리에 둔다)"""
+    return bounded_map(load_user_record, load_data(USERS_FILE, {}).items(), workers=workers)
+
+def validate_user_record(record):
+    """가져올 레코드 형식 검사. 문제가 있으면 오류 메시지"""
+    if not isinstance(record, dict):
+        return 'record must be an object'
+    username = record.get('username')
+    if not isinstance(username, str) or not username or os.path.basename(username) != username or '..' in username:
+        return 'invalid username'
+    if not isinstance(record.get('password_hash'), str):
+        return 'password_hash is required'
+    if not isinstance(record.get('player', {}), dict) or not isinstance(record.get('goals', []), list):
+        return 'player must be an object and goals a list'
+    for goal in record.get('goals', []):
+        if not isinstance(goal, dict) or not isinstance(goal.get('status'), str) or not isinstance(goal.get('text', ''), str):
+            return 'each goal must be an object with a text and status'
+        # 날짜는 문자열 (YYYY-MM-DD) 로 정렬/비교하므로 다른 타입이 섞이면 안 된다
+        for field in ('id', 'type', 'deadline', 'completion_date', 'last_completed'):
+            if goal.get(field) is not None and not isinstance(goal[field], str):
+                return f'goal {field} must be a string'
+    return None
+
+def import_user_record(record):
+    """레코드의 플레이어 데이터/목표를 저장하고 재화 원장 잔액을 레코드 값으로 맞춘다.
+
+    변환/집계를 모두 끝낸 뒤에 파일을 쓰므로 잘못된 값이 있으면 아무 파일도 남기지 않는다.
+    """
+    username = record['username']
+    player_data = default_player_data()
+    player_data.update(record.get('player', {}))
+    for key in ('tickets', 'score', 'level', 'exp', 'hp'):
+        player_data[key] = int(player_data[key])
+    if not isinstance(player_data['items'], list):
+        raise ValueError('player.items must be a list')
+    goals = record.get('goals', [])
+    ensure_goal_ids(goals)
+    today_str = str(date.today())
+    view = [dict(goal) for goal in goals]  # 파일에는 받은 그대로, 집계는 오늘 기준 상태로
+    reset_recurring_goals(view, today_str)
+    stats = build_goal_stats(view, today_str)
+    save_data(player_data, user_data_path(username, 'player'))
+    goals_path = user_data_path(username, 'goals')
+    save_data(goals, goals_path)
+    _goal_index_cache.pop(goals_path, None)
+    save_data(stats, user_data_path(username, 'stats'))
+    currency.reset(username, 'import', keep_key_prefixes=('',), balances=player_data, items=player_data['items'])
+    currency.evict(username)
+
+def import_user_records(lines, overwrite=False, workers=EXPORT_WORKERS):
+    """NDJSON 줄들을 읽어 유저를 가져온다. 잘못된 레코드는 건너뛰고 오류 목록에 남긴다.
+
+    파일 쓰기는 스레드 풀에서 하고, 계정 파일 (users.json) 은 마지막에 한 번만 저장한다.
+    입력을 읽다가 중간에 실패해도 그때까지 가져온 유저는 계정 파일에 남긴다.
+    """
+    users = load_data(USERS_FILE, {})
+    seen = set()
+    summary = {'imported': 0, 'failed': 0, 'errors': []}
+
+    def fail(line_no, username, error):
+        summary['failed'] += 1
+        if len(summary['errors']) < IMPORT_MAX_ERRORS:
+            summary['errors'].append({'line': line_no, 'username': username, 'error': error})
+
+    def accepted():
+        for line_no, record, error in iter_ndjson(lines):
+            username = record.get('username') if isinstance(record, dict) else None
+            error = error or validate_user_record(record)
+            if error is None and username in seen:
+                error = 'duplicate username in input'
+            elif error is None and username in users and not overwrite:
+                error = 'user already exists'
+            if error:
+                fail(line_no, username, error)
+                continue
+            seen.add(username)
+            yield line_no, record
+
+    def write(item):
+        line_no, record = item
+        try:
+            import_user_record(record)
+        except Exception as e:  # 레코드 하나의 실패가 전체 가져오기를 멈추지 않도록
+            return line_no, record, f'{type(e).__name__}: {e}'
+        return line_no, record, None
+
+    try:
+        for line_no, record, error in bounded_map(write, accepted(), workers=workers):
+            if error:
+                fail(line_no, record['username'], error)
+                continue
+            users[record['username']] = record['password_hash']
+            summary['imported'] += 1
+    finally:
+        if summary['imported']:
+            save_data(users, USERS_FILE)
+    return summary
+
+@main.cli.command('export-users')
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-', help='NDJSON 파일 (기본: 표준 출력)')
+@click.option('--workers', default=EXPORT_WORKERS, show_default=True)
+def export_users_command(output, workers):
+    """전체 유저 데이터를 한 줄에 한 명씩 NDJSON으로 내보내기"""
+    for record in iter_user_records(workers):
+        output.write(dump_line(record))
+
+@main.cli.command('import-users')
+@click.argument('input_file', type=click.File('rb'))
+@click.option('--overwrite', is_flag=True, help='이미 있는 유저도 덮어쓰기')
+@click.option('--workers', default=EXPORT_WORKERS, show_default=True)
+def import_users_command(input_file, overwrite, workers):
+    """export-users로 만든 NDJSON 파일에서 유저 가져오기"""
+    summary = import_user_records(input_file, overwrite=overwrite, workers=workers)
+    for error in summary['errors']:
+        click.echo(f"line {error['line']} ({error['username']}): {error['error']}", err=True)
+    click.echo(f"imported={summary['imported']}, failed={summary['failed']}")
+
+@main.cli.command('check-goal-stats')
+@click.option('--rebuild', is_flag=True, help='없거나 맞지 않는 집계를 목표 파일 기준으로 다시 만들기')
+@click.option('--all', 'rebuild_all', is_flag=True, help='검사 없이 전체 유저 집계 다시 만들기')
+def check_goal_stats_command(rebuild, rebuild_all):
+    """저장된 목표 집계 (프로필/대시보드 통계) 가 목표 파일과 맞는지 검사 (집계 파일이 없는 유저는 따로 센다)"""
+    today_str = str(date.today())
+    checked = missing = mismatched = rebuilt = 0
+    for batch in iter_username_batches():
+        for username in batch:
+            status, expected = check_goal_stats(username, today_str)
+            checked += 1
+            if status == 'missing':
+                missing += 1
+            elif status == 'mismatch':
+                mismatched += 1
+                if not (rebuild or rebuild_all):
+                    click.echo(f"mismatch: {username}", err=True)
+            if rebuild_all or (rebuild and status != 'ok'):
+                save_data(expected, user_data_path(username, 'stats'))
+                rebuilt += 1
+    click.echo(f"checked={checked}, missing={missing}, mismatched={mismatched}, rebuilt={rebuilt}")
 
 # --- 유저 인증 경로 ---
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     lang = session.get('lang', 'en')
-    t = translations[lang]
+    t = get_translations()[lang]
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         users = load_data(USERS_FILE, {})
         if username in users:
             flash('Username already exists!', 'error')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
         users[username] = generate_password_hash(password)
         save_data(users, USERS_FILE)
+        # 가입 당일 보너스는 daily_rewards 작업을 기다리지 않고 바로 지급
+        today_str = str(date.today())
+        save_data(default_player_data(), user_data_path(username, 'player'))
+        currency.apply(username, {'tickets': DAILY_LOGIN_REWARD}, 'daily_bonus', key=f'daily:{today_str}')
         flash('Registration successful! Please log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     return render_template('register.html', t=t)
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     lang = session.get('lang', 'en')
-    t = translations[lang]
+    t = get_translations()[lang]
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         remember = 'remember' in request.form
         users = load_data(USERS_FILE, {})
         if username in users and check_password_hash(users[username], password):
+            session.rotate()
             session['username'] = username
             session.permanent = remember
             flash(f'Welcome back, {username}!', 'success')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         else:
             flash('Invalid username or password.', 'error')
     return render_template('login.html', t=t)
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     session.pop('username', None)
     flash('You have been logged out.', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/set_language/<lang>')
+@main.route('/set_language/<lang>')
 def set_language(lang):
     session['lang'] = lang
-    return redirect(request.referrer or url_for('index'))
+    return redirect(request.referrer or url_for('main.index'))
 
-@app.route('/forgot_password', methods=['GET', 'POST'])
+@main.route('/forgot_password', methods=['GET', 'POST'])
 def forgot_password():
     lang = session.get('lang', 'en')
-    t = translations[lang]
+    t = get_translations()[lang]
     if request.method == 'POST':
         username = request.form['username']
         users = load_data(USERS_FILE, {})
@@ -361,10 +1237,10 @@ def forgot_password():
             users[username] = generate_password_hash(temp_password)
             save_data(users, USERS_FILE)
             flash(f'Your temporary password is: {temp_password}. Please log in and change it immediately.', 'success')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         else:
             flash('Username not found.', 'error')
-            return redirect(url_for('forgot_password'))
+            return redirect(url_for('main.forgot_password'))
     return render_template('forgot_password.html', t=t)
 
 # --- 페이지 렌더링 경로 ---
@@ -373,7 +1249,7 @@ def get_common_render_data():
     theme = 'dark-theme' if player_data and 'item004' in player_data.get('items', []) else 'light-theme'
     equipped_badge_icon = SHOP_ITEMS.get(player_data.get('equipped_badge', ''), {}).get('icon') if player_data else None
     lang = session.get('lang', 'en')
-    t = translations[lang]
+    t = get_translations()[lang]
     return {
         'player_data': player_data,
         'theme': theme,
@@ -381,7 +1257,7 @@ def get_common_render_data():
         't': t
     }
 
-@app.route('/')
+@main.route('/')
 def index():
     if 'username' not in session:
         common_data = get_common_render_data()
@@ -389,36 +1265,38 @@ def index():
     common_data = get_common_render_data()
     player_data = common_data['player_data']
     today_str = str(date.today())
-    if player_data.get('last_login_date') != today_str:
-        player_data['tickets'] += DAILY_LOGIN_REWARD
-        player_data['last_login_date'] = today_str
-        save_user_player_data(player_data)
+    # 보너스 지급은 daily_rewards 작업이 담당하고, 여기서는 오늘 처음 방문했을 때 알림만 띄운다
+    if session.get('bonus_notified') != today_str and currency.has_key(session['username'], f'daily:{today_str}'):
+        session['bonus_notified'] = today_str
         flash(f'Daily Login Bonus! You received {DAILY_LOGIN_REWARD} tickets. 🎟️', 'success')
     goals = load_user_goals()
     return render_template('index.html', goal_list=goals, tickets=player_data['tickets'], today=today_str, **common_data)
 
-@app.route('/game_room')
+@main.route('/game_room')
 def game_room():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     return render_template('game_room.html', **common_data)
 
-@app.route('/mmorpg_game')
+@main.route('/mmorpg_game')
 def mmorpg_game():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
-    return render_template('mmorpg_game.html', **common_data)
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
+    transports = TRANSPORT_PROFILES[current_app.config['SOCKET_TRANSPORT_PROFILE']]['transports']
+    combat_ranges = {'monster': MONSTER_ATTACK_RANGE, 'item': ITEM_COLLECT_RANGE, 'player': DUEL_ATTACK_RANGE}
+    return render_template('mmorpg_game.html', world_map=get_world_map().to_dict(), socket_transports=transports,
+                           combat_ranges=combat_ranges, action_cooldowns=ACTION_COOLDOWNS, **common_data)
 
-@app.route('/shop')
+@main.route('/shop')
 def shop():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     return render_template('shop.html', items=SHOP_ITEMS, player_score=common_data['player_data']['score'], player_items=common_data['player_data']['items'], **common_data)
 
-@app.route('/profile')
+@main.route('/profile')
 def profile():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     player_data = common_data['player_data']
     owned_badges = {item_id: SHOP_ITEMS[item_id] for item_id in player_data['items'] if 'Badge' in SHOP_ITEMS[item_id]['name']}
     
@@ -441,18 +1319,14 @@ def profile():
         }
     ]
     
-    # 통계 계산
-    goals = load_user_goals()
-    total_goals = len(goals)
-    completed_goals = len([g for g in goals if g['status'] == 'Completed'])
-    completion_rate = int((completed_goals / total_goals) * 100) if total_goals > 0 else 0
-    
+    # 통계 (목표 변경 때 갱신해 둔 집계 사용)
+    goal_stats = goal_stats_view(load_user_goal_stats(), str(date.today()))
     stats = {
         'score': player_data['score'],
         'tickets': player_data['tickets'],
-        'total_goals': total_goals,
-        'completed_goals': completed_goals,
-        'completion_rate': completion_rate
+        'total_goals': goal_stats['total_goals'],
+        'completed_goals': goal_stats['completed_goals'],
+        'completion_rate': goal_stats['completion_rate']
     }
     
     # 가입일 추가
@@ -465,271 +1339,291 @@ def profile():
                          stats=stats,
                          **common_data)
 
-@app.route('/guess_the_number')
+@main.route('/guess_the_number')
 def guess_the_number():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     if 'answer' not in session:
         session['answer'] = random.randint(1, 100)
     return render_template('guess_the_number.html', tickets=common_data['player_data']['tickets'], message=session.get('message', 'Guess a number between 1 and 100!'), **common_data)
 
-@app.route('/memory_game')
+@main.route('/memory_game')
 def memory_game():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     return render_template('memory_game.html', tickets=common_data['player_data']['tickets'], **common_data)
 
-@app.route('/leaderboard')
+@main.route('/leaderboard')
 def leaderboard():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     all_players = []
     for player_file in glob.glob('data_*_player.json'):
         username = player_file.split('_')[1]
-        player_info = load_data(player_file, {})
-        all_players.append({'username': username, 'score': player_info.get('score', 0)})
+        all_players.append({'username': username, 'score': currency.balance(username, 'score')})
     sorted_players = sorted(all_players, key=lambda p: p['score'], reverse=True)
     return render_template('leaderboard.html', players=sorted_players, **common_data)
 
-@app.route('/dashboard')
+@main.route('/dashboard')
 def dashboard():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     player_data = common_data['player_data']
-    goals = load_user_goals()
-    total_goals = len(goals)
-    completed_goals = len([g for g in goals if g['status'] == 'Completed'])
-    completion_rate = int((completed_goals / total_goals) * 100) if total_goals > 0 else 0
+    goal_stats = goal_stats_view(load_user_goal_stats(), str(date.today()))
     stats = {
         'score': player_data.get('score', 0),
         'tickets': player_data.get('tickets', 0),
-        'total_goals': total_goals,
-        'completed_goals': completed_goals,
-        'completion_rate': completion_rate
+        'total_goals': goal_stats['total_goals'],
+        'completed_goals': goal_stats['completed_goals'],
+        'completion_rate': goal_stats['completion_rate']
     }
-    chart_labels = []
-    chart_data = []
-    today = date.today()
-    for i in range(6, -1, -1):
-        day = today - timedelta(days=i)
-        day_str = str(day)
-        chart_labels.append(day.strftime('%m/%d'))
-        completed_on_day = 0
-        for goal in goals:
-            if goal.get('completion_date') == day_str:
-                completed_on_day += 1
-        chart_data.append(completed_on_day)
-    return render_template('dashboard.html', stats=stats, chart_labels=chart_labels, chart_data=chart_data, **common_data)
-
-@app.route('/calendar')
+    return render_template('dashboard.html', stats=stats, chart_labels=goal_stats['chart_labels'],
+                           chart_data=goal_stats['chart_data'], **common_data)
+
+@main.route('/calendar')
 def calendar():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     return render_template('calendar.html', **common_data)
 
-@app.route('/get_calendar_events')
+@main.route('/get_calendar_events')
 def get_calendar_events():
     if 'username' not in session:
         return jsonify([])
     try:
-        goals = load_user_goals()
+        # FullCalendar가 보내는 start/end (ISO 날짜시간)에서 날짜 부분만 사용
+        start = request.args.get('start', '')[:10] or None
+        end = request.args.get('end', '')[:10] or None
+        goals, goal_index = load_user_goal_index()
         events = []
-        for i, goal in enumerate(goals):
-            if 'deadline' in goal:
-                events.append({
-                    'id': str(i),
-                    'title': goal['text'],
-                    'start': goal['deadline'],
-                    'backgroundColor': '#28a745' if goal['status'] == 'Completed' else '#007bff',
-                    'allDay': True
-                })
+        for goal in goals_in_range(goals, goal_index, start, end):
+            events.append({
+                'id': goal['id'],
+                'title': goal['text'],
+                'start': goal['deadline'],
+                'backgroundColor': '#28a745' if goal['status'] == 'Completed' else '#007bff',
+                'allDay': True
+            })
         print(f"Sending {len(events)} events")  # 디버깅용 로그
         return jsonify(events)
     except Exception as e:
         print(f"Error in get_calendar_events: {str(e)}")  # 디버깅용 로그
         return jsonify([])
 
-@app.route('/add_calendar_goal', methods=['POST'])
+@main.route('/add_calendar_goal', methods=['POST'])
 def add_calendar_goal():
     if 'username' not in session:
         return jsonify({'success': False, 'error': 'Not logged in'})
     data = request.get_json()
-    goals = load_user_goals()
-    new_goal = {
-        'text': data['title'],
-        'status': 'In Progress',
-        'deadline': data['date']
-    }
-    if data['isRecurring']:
-        new_goal['type'] = 'recurring'
-        new_goal['last_completed'] = None
-    goals.append(new_goal)
-    save_user_goals(goals)
+    goals = load_user_goals(copy=True)
+    stats = load_user_goal_stats()
+    goal = new_goal(data['title'], data['date'], data['isRecurring'])
+    goals.append(goal)
+    track_goal_change(stats, None, goal)
+    save_user_goals(goals, stats)
     return jsonify({
         'success': True,
         'goal': {
-            'id': str(len(goals) - 1),
+            'id': goal['id'],
             'title': data['title'],
             'date': data['date']
         }
     })
 
-@app.route('/toggle_calendar_goal/<goal_id>', methods=['POST'])
+@main.route('/toggle_calendar_goal/<goal_id>', methods=['POST'])
 def toggle_calendar_goal(goal_id):
     if 'username' not in session:
         return jsonify({'success': False, 'error': 'Not logged in'})
-    goals = load_user_goals()
-    goal_id = int(goal_id)
-    if 0 <= goal_id < len(goals):
-        goal = goals[goal_id]
+    goals, goal_index = load_user_goal_index(copy=True)
+    goal = find_goal(goals, goal_index, goal_id)
+    if goal:
+        stats = load_user_goal_stats()
+        before = dict(goal)
         goal['status'] = 'Completed' if goal['status'] == 'In Progress' else 'In Progress'
-        save_user_goals(goals)
+        track_goal_change(stats, before, goal)
+        save_user_goals(goals, stats)
         return jsonify({
             'success': True,
             'completed': goal['status'] == 'Completed'
         })
     return jsonify({'success': False, 'error': 'Goal not found'})
 
-@app.route('/settings')
+@main.route('/settings')
 def settings():
     common_data = get_common_render_data()
-    if not common_data or 'username' not in session: return redirect(url_for('login'))
+    if not common_data or 'username' not in session: return redirect(url_for('main.login'))
     return render_template('settings.html', **common_data)
 
 # --- 데이터 처리 경로 ---
-@app.route('/add_goal', methods=['POST'])
+# 목표 변경 API는 전체 목록 대신 바뀐 목표만 돌려준다
+@main.route('/add_goal', methods=['POST'])
 def add_goal():
     if 'username' not in session: return jsonify({'success': False, 'error': 'Not logged in'})
-    goals = load_user_goals()
-    goal_text = request.form['goal']
-    is_recurring = 'is_recurring' in request.form
-    deadline = request.form.get('deadline')
-    new_goal = {'text': goal_text, 'status': 'In Progress'}
-    if is_recurring:
-        new_goal['type'] = 'recurring'
-        new_goal['last_completed'] = None
-    if deadline:
-        new_goal['deadline'] = deadline
-    goals.append(new_goal)
-    save_user_goals(goals)
-    return jsonify({'success': True, 'goals': goals})
-
-@app.route('/delete/<int:goal_id>', methods=['POST'])
+    goals = load_user_goals(copy=True)
+    stats = load_user_goal_stats()
+    goal = new_goal(request.form['goal'], request.form.get('deadline'), 'is_recurring' in request.form)
+    goals.append(goal)
+    track_goal_change(stats, None, goal)
+    save_user_goals(goals, stats)
+    return jsonify({'success': True, 'goal': goal})
+
+@main.route('/delete/<goal_id>', methods=['POST'])
 def delete_goal(goal_id):
     if 'username' not in session: return jsonify({'success': False, 'error': 'Not logged in'})
-    goals = load_user_goals()
-    if 0 <= goal_id < len(goals):
-        goals.pop(goal_id)
-        save_user_goals(goals)
-    return jsonify({'success': True, 'goals': goals})
-
-@app.route('/toggle/<int:goal_id>', methods=['POST'])
+    goals, goal_index = load_user_goal_index(copy=True)
+    i = goal_index['by_id'].get(goal_id)
+    if i is None:
+        return jsonify({'success': False, 'error': 'Goal not found'})
+    stats = load_user_goal_stats()
+    track_goal_change(stats, goals.pop(i), None)
+    save_user_goals(goals, stats)
+    return jsonify({'success': True, 'deleted': goal_id})
+
+@main.route('/toggle/<goal_id>', methods=['POST'])
 def toggle_status(goal_id):
     if 'username' not in session: return jsonify({'success': False, 'error': 'Not logged in'})
-    goals = load_user_goals()
+    goals, goal_index = load_user_goal_index(copy=True)
+    goal = find_goal(goals, goal_index, goal_id)
+    if not goal:
+        return jsonify({'success': False, 'error': 'Goal not found'})
     player_data = load_user_player_data()
-    if 0 <= goal_id < len(goals):
-        goal = goals[goal_id]
-        today_str = str(date.today())
-        if goal['status'] == 'In Progress':
-            goal['status'] = 'Completed'
-            player_data['tickets'] += 1
-            player_data['exp'] += 10  # MMORPG 경험치 추가
-            if goal.get('type') == 'recurring':
-                goal['last_completed'] = today_str
+    stats = load_user_goal_stats()
+    before = dict(goal)
+    ticket_delta = toggle_goal(goal, player_data, str(date.today()))
+    track_goal_change(stats, before, goal)
+    save_user_goals(goals, stats)
+    save_user_player_data(player_data)
+    balances = change_balance({'tickets': ticket_delta}, 'goal_toggle', clamp=True)['balances']
+    return jsonify({'success': True, 'goal': goal, 'tickets': balances['tickets']})
+
+@main.route('/goals/batch', methods=['POST'])
+def batch_goals():
+    """여러 목표 변경(add/toggle/delete)을 한 번에 적용"""
+    if 'username' not in session: return jsonify({'success': False, 'error': 'Not logged in'})
+    body = request.get_json(silent=True) or {}
+    ops = body.get('ops', []) if isinstance(body, dict) else None
+    if not isinstance(ops, list):
+        return jsonify({'success': False, 'error': 'ops must be a list'}), 400
+    if len(ops) > MAX_BATCH_OPS:
+        return jsonify({'success': False, 'error': f'Too many ops (max {MAX_BATCH_OPS})'}), 400
+    goals, goal_index = load_user_goal_index(copy=True)
+    by_id = dict(goal_index['by_id'])
+    player_data = load_user_player_data()
+    stats = load_user_goal_stats()
+    today_str = str(date.today())
+    results = []
+    deleted = set()
+    ticket_delta = 0
+    for op in ops:
+        if not isinstance(op, dict):
+            results.append({'success': False, 'error': 'Op must be an object'})
+            continue
+        action = op.get('op')
+        if action == 'add':
+            if not isinstance(op.get('text', ''), str) or not isinstance(op.get('deadline') or '', str):
+                results.append({'success': False, 'error': 'text and deadline must be strings'})
+                continue
+            goal = new_goal(op.get('text', ''), op.get('deadline'), op.get('is_recurring', False))
+            by_id[goal['id']] = len(goals)
+            goals.append(goal)
+            track_goal_change(stats, None, goal)
+            results.append({'success': True, 'goal': goal})
+        elif action in ('toggle', 'delete'):
+            goal_id = op.get('id')
+            i = by_id.get(goal_id) if isinstance(goal_id, str) else None
+            if i is None or goal_id in deleted:
+                results.append({'success': False, 'id': goal_id, 'error': 'Goal not found'})
+            elif action == 'toggle':
+                before = dict(goals[i])
+                ticket_delta += toggle_goal(goals[i], player_data, today_str)
+                track_goal_change(stats, before, goals[i])
+                results.append({'success': True, 'goal': goals[i]})
             else:
-                goal['completion_date'] = today_str
+                # 위치가 밀리지 않도록 삭제는 마지막에 한 번에 반영
+                deleted.add(goal_id)
+                track_goal_change(stats, goals[i], None)
+                results.append({'success': True, 'deleted': goal_id})
         else:
-            if goal.get('type') != 'recurring':
-                goal['status'] = 'In Progress'
-                if player_data['tickets'] > 0: player_data['tickets'] -= 1
-                if 'completion_date' in goal:
-                    del goal['completion_date']
-        save_user_goals(goals)
-        save_user_player_data(player_data)
-    return jsonify({'success': True, 'goals': goals, 'tickets': player_data['tickets']})
+            results.append({'success': False, 'error': f'Unknown op: {action}'})
+    if deleted:
+        goals = [goal for goal in goals if goal['id'] not in deleted]
+    save_user_goals(goals, stats)
+    save_user_player_data(player_data)
+    balances = change_balance({'tickets': ticket_delta}, 'goal_toggle', clamp=True)['balances']
+    return jsonify({'success': True, 'results': results, 'tickets': balances['tickets']})
 
-@app.route('/guess', methods=['POST'])
+@main.route('/guess', methods=['POST'])
 def guess():
-    if 'username' not in session: return redirect(url_for('login'))
-    player_data = load_user_player_data()
+    if 'username' not in session: return redirect(url_for('main.login'))
     lang = session.get('lang', 'en')
-    t = translations[lang]
-    if player_data['tickets'] > 0:
-        player_data['tickets'] -= 1
-        guess = int(request.form['guess'])
-        answer = session.get('answer', 50)
+    t = get_translations()[lang]
+    guess = int(request.form['guess'])
+    answer = session.get('answer', 50)
+    # 티켓 차감과 정답 보상을 한 거래로 처리
+    result = change_balance({'tickets': -1, 'score': 10 if guess == answer else 0}, 'guess_the_number')
+    if result['ok']:
         if guess < answer: session['message'] = f"Too low! You guessed {guess}."
         elif guess > answer: session['message'] = f"Too high! You guessed {guess}."
         else:
             session['message'] = f"You got it! The number was {answer}. (+10 Score Bonus!)"
-            player_data['score'] += 10
             session.pop('answer', None)
-        save_user_player_data(player_data)
     else:
         session['message'] = "Not enough tickets to guess!"
-    return redirect(url_for('guess_the_number'))
+    return redirect(url_for('main.guess_the_number'))
 
-@app.route('/memory_game_reward', methods=['POST'])
+@main.route('/memory_game_reward', methods=['POST'])
 def memory_game_reward():
     if 'username' not in session: return jsonify({'success': False, 'message': 'Not logged in!'})
-    player_data = load_user_player_data()
-    player_data['score'] += 5
-    save_user_player_data(player_data)
-    return jsonify({'success': True, 'score': player_data['score']})
+    result = change_balance({'score': 5}, 'memory_game', key=request_idempotency_key('memory_game'))
+    return jsonify({'success': True, 'score': result['balances']['score']})
 
-@app.route('/spend_ticket', methods=['POST'])
+@main.route('/spend_ticket', methods=['POST'])
 def spend_ticket():
     if 'username' not in session: return jsonify({'success': False, 'message': 'Not logged in!'})
-    player_data = load_user_player_data()
-    tickets_to_spend = request.json.get('tickets', 1)
-    if player_data['tickets'] >= tickets_to_spend:
-        player_data['tickets'] -= tickets_to_spend
-        save_user_player_data(player_data)
-        return jsonify({'success': True, 'tickets': player_data['tickets']})
+    tickets_to_spend = max(0, int(request.json.get('tickets', 1)))
+    result = change_balance({'tickets': -tickets_to_spend}, 'spend_ticket', key=request_idempotency_key('spend_ticket'))
+    if result['ok']:
+        return jsonify({'success': True, 'tickets': result['balances']['tickets']})
     else:
         return jsonify({'success': False, 'message': 'Not enough tickets!'})
 
-@app.route('/buy_item/<item_id>', methods=['POST'])
+@main.route('/buy_item/<item_id>', methods=['POST'])
 def buy_item(item_id):
-    if 'username' not in session: return redirect(url_for('login'))
+    if 'username' not in session: return redirect(url_for('main.login'))
     player_data = load_user_player_data()
     if item_id in SHOP_ITEMS:
         item = SHOP_ITEMS[item_id]
-        if item_id not in player_data['items'] and player_data['score'] >= item['price']:
-            player_data['score'] -= item['price']
-            player_data['items'].append(item_id)
-            save_user_player_data(player_data)
-    return redirect(url_for('shop'))
+        if item_id not in player_data['items']:
+            # 차감과 소유를 원장의 한 줄로 기록 (플레이어 파일은 다른 요청이 덮어쓸 수 있다)
+            change_balance({'score': -item['price']}, 'buy_item', grant=item_id)
+    return redirect(url_for('main.shop'))
 
-@app.route('/get_ad_reward', methods=['POST'])
+@main.route('/get_ad_reward', methods=['POST'])
 def get_ad_reward():
     if 'username' not in session: return jsonify({'success': False, 'message': 'Not logged in!'})
-    player_data = load_user_player_data()
-    player_data['tickets'] += 1
-    save_user_player_data(player_data)
-    return jsonify({'success': True, 'tickets': player_data['tickets']})
+    result = change_balance({'tickets': 1}, 'ad_reward', key=request_idempotency_key('ad_reward'))
+    return jsonify({'success': True, 'tickets': result['balances']['tickets']})
 
-@app.route('/equip_badge/<item_id>', methods=['POST'])
+@main.route('/equip_badge/<item_id>', methods=['POST'])
 def equip_badge(item_id):
-    if 'username' not in session: return redirect(url_for('login'))
+    if 'username' not in session: return redirect(url_for('main.login'))
     player_data = load_user_player_data()
     if item_id in player_data['items'] and 'Badge' in SHOP_ITEMS[item_id]['name']:
         player_data['equipped_badge'] = item_id
         save_user_player_data(player_data)
-    return redirect(url_for('profile'))
+    return redirect(url_for('main.profile'))
 
-@app.route('/reset_progress', methods=['POST'])
+@main.route('/reset_progress', methods=['POST'])
 def reset_progress():
-    if 'username' not in session: return redirect(url_for('login'))
-    default_player_data = {'tickets': 0, 'score': 0, 'items': [], 'equipped_badge': None, 'last_login_date': None, 'level': 1, 'exp': 0, 'hp': 100}
-    save_user_player_data(default_player_data)
+    if 'username' not in session: return redirect(url_for('main.login'))
+    save_user_player_data(default_player_data())
+    currency.reset(session['username'], keep_key_prefixes=('daily:',))
     flash('Your game progress has been reset!', 'success')
-    return redirect(url_for('settings'))
+    return redirect(url_for('main.settings'))
 
-@app.route('/change_password', methods=['POST'])
+@main.route('/change_password', methods=['POST'])
 def change_password():
-    if 'username' not in session: return redirect(url_for('login'))
+    if 'username' not in session: return redirect(url_for('main.login'))
     current_password = request.form['current_password']
     new_password = request.form['new_password']
     confirm_password = request.form['confirm_password']
@@ -737,98 +1631,229 @@ def change_password():
     username = session['username']
     if not check_password_hash(users[username], current_password):
         flash('Current password is incorrect.', 'error')
-        return redirect(url_for('settings'))
+        return redirect(url_for('main.settings'))
     if new_password != confirm_password:
         flash('New passwords do not match.', 'error')
-        return redirect(url_for('settings'))
+        return redirect(url_for('main.settings'))
     users[username] = generate_password_hash(new_password)
     save_data(users, USERS_FILE)
     flash('Password changed successfully!', 'success')
-    return redirect(url_for('settings'))
+    return redirect(url_for('main.settings'))
+
+# --- 관리자 경로 ---
+def is_admin():
+    return session.get('username') in current_app.config['ADMIN_USERS']
+
+@main.route('/admin/metrics')
+def admin_metrics():
+    """예약 작업 통계와 게임 서버 상태 (연결별 송신 대기열 메모리 포함)"""
+    if not is_admin(): return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    metrics = {
+        'jobs': scheduler.metrics(),
+        'game_jobs': game_scheduler.metrics(),
+        'sessions': session_store.stats(),
+        'game_server': dict(game_server)
+    }
+    if game_server['world_ready']:
+        metrics['players'] = len(game_world['players'])
+        metrics['outbound'] = outbound.stats()
+        metrics['combat'] = combat.stats()
+        metrics['transport_queues'] = {sid: transport_queue_depth(sid) for sid in game_world['players']}
+    return jsonify(metrics)
+
+@main.route('/admin/export')
+def admin_export():
+    """전체 유저 데이터 NDJSON 스트림 (한 명씩 만들어서 바로 보낸다)"""
+    if not is_admin(): return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    records = iter_user_records()
+    return Response(stream_with_context(dump_line(record) for record in records), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename=users-{date.today()}.ndjson'})
+
+@main.route('/admin/import', methods=['POST'])
+def admin_import():
+    """요청 본문의 NDJSON을 줄 단위로 읽어서 유저 가져오기 (?overwrite=1 이면 기존 유저 덮어쓰기)"""
+    if not is_admin(): return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    summary = import_user_records(request.stream, overwrite=request.args.get('overwrite') == '1')
+    return jsonify({'success': not summary['failed'], **summary})
 
 # --- WebSocket 이벤트 핸들러들 ---
+def remove_player(session_id):
+    """게임 월드에서 플레이어 제거 및 퇴장 알림"""
+    player = game_world['players'].get(session_id)
+    if player and player.get('in_duel') in game_world['duels']:
+        # 듀얼 중 이탈 - 상대방 승리로 종료
+        duel = game_world['duels'][player['in_duel']]
+        opponent_id = duel['player2_id'] if duel['player1_id'] == session_id else duel['player1_id']
+        if opponent_id in game_world['players']:
+            event_sink('duel_ended', {
+                'winner': game_world['players'][opponent_id]['username'],
+                'loser': player['username'],
+                'result': 'victory'
+            }, room=opponent_id)
+        end_duel(player['in_duel'], opponent_id)
+    if player and player.get('spectating') in game_world['duels']:
+        game_world['duels'][player['spectating']]['spectators'].remove(session_id)
+    if session_id in game_world['players']:
+        # 다른 플레이어들에게 플레이어 떠남 알림
+        event_sink('player_left', {'session_id': session_id}, room='game_world')
+        
+        # 게임 월드에서 플레이어 제거
+        del game_world['players'][session_id]
+        player_grid.remove(session_id)
+        flow_fields.forget(session_id)
+        outbound.forget(session_id)
+        combat.forget(session_id)
+        leave_room('game_world', sid=session_id)
+
 @socketio.on('connect')
 def on_connect():
+    if not current_app.config['GAME_SERVER_ENABLED']:
+        return False
+    if current_app.config['GAME_TICK_LOOP']:
+        start_game_server()
+    else:
+        ensure_game_world()
     if 'username' in session:
-        player_data = load_user_player_data()
+        username = session['username']
         session_id = request.sid
-        
-        # 게임 월드에 플레이어 추가
-        game_world['players'][session_id] = {
-            'username': session['username'],
-            'x': random.randint(100, 700),
-            'y': random.randint(100, 500),
-            'level': player_data.get('level', 1),
-            'exp': player_data.get('exp', 0),
-            'hp': player_data.get('hp', 100),
-            'last_seen': date.today().isoformat()
-        }
-        
+        old_session_id = get_user_session(username)
+        if old_session_id:
+            if current_app.config['MULTI_SESSION_POLICY'] == 'reject_new':
+                return False
+            # 최신 접속 우선: 기존 세션은 게임에서 빼고 연결 종료
+            remove_player(old_session_id)
+            unregister_session(old_session_id)
+            socketio.emit('session_replaced', {'message': '다른 곳에서 접속하여 연결이 종료되었습니다.'}, room=old_session_id)
+            disconnect(sid=old_session_id)
+        register_session(username, session_id)
         join_room('game_world')
-        
-        # 현재 게임 상태를 새 플레이어에게 전송
-        emit('game_state', {
-            'players': game_world['players'],
-            'monsters': game_world['monsters'],
-            'items': game_world['items']
-        })
-        
-        # 다른 플레이어들에게 새 플레이어 알림
-        emit('player_joined', {
-            'session_id': session_id,
-            'player': game_world['players'][session_id]
-        }, room='game_world', include_self=False)
+        add_player(session_id, username, load_user_player_data())
 
 @socketio.on('disconnect')
 def on_disconnect():
     session_id = request.sid
-    if session_id in game_world['players']:
-        # 다른 플레이어들에게 플레이어 떠남 알림
-        emit('player_left', {'session_id': session_id}, room='game_world')
-        
-        # 게임 월드에서 플레이어 제거
-        del game_world['players'][session_id]
-        leave_room('game_world')
+    unregister_session(session_id)
+    remove_player(session_id)
 
 @socketio.on('player_move')
 def on_player_move(data):
-    session_id = request.sid
+    move_player(request.sid, data['x'], data['y'])
+
+@socketio.on('attack_monster')
+def on_attack_monster(data):
+    player_attack_monster(request.sid, data.get('monster_id'))
+
+@socketio.on('collect_item')
+def on_collect_item(data):
+    player_collect_item(request.sid, data.get('item_id'))
+
+# --- 월드 플레이어 행동 (소켓 핸들러와 헤드리스 시뮬레이터가 같이 쓴다) ---
+def add_player(session_id, username, player_data):
+    """게임 월드에 플레이어 추가 (복구된 마지막 위치가 있으면 그 자리에서 시작)"""
+    position = last_positions.pop(username, None) or random_open_position((100, 700), (100, 500))
+    game_world['players'][session_id] = {
+        'username': username,
+        'x': position['x'],
+        'y': position['y'],
+        'level': player_data.get('level', 1),
+        'exp': player_data.get('exp', 0),
+        'hp': player_data.get('hp', 100),
+        'last_seen': date.today().isoformat()
+    }
+    update_player_position(session_id, position['x'], position['y'])
+    
+    # 현재 게임 상태를 새 플레이어에게 전송
+    event_sink('game_state', world_state(), room=session_id)
+    
+    # 다른 플레이어들에게 새 플레이어 알림
+    event_sink('player_joined', {
+        'session_id': session_id,
+        'player': game_world['players'][session_id]
+    }, room='game_world', skip_sid=session_id)
+
+def move_player(session_id, x, y):
     if session_id in game_world['players']:
+        player = game_world['players'][session_id]
+        if not all(isinstance(v, (int, float)) and math.isfinite(v) for v in (x, y)):
+            combat.reject(session_id, 'player_move', 'invalid')
+            return
+        x = max(25, min(775, x))
+        y = max(25, min(575, y))
+        
+        # 서버가 아는 위치에서 허용 거리만큼만 이동 (순간이동으로 사거리 판정을 넘지 못하도록)
+        distance = distance_between((player['x'], player['y']), (x, y))
+        allowed = combat.allow_move(session_id, distance, world_clock())
+        if allowed < distance:
+            ratio = allowed / distance
+            x = round(player['x'] + (x - player['x']) * ratio, 1)
+            y = round(player['y'] + (y - player['y']) * ratio, 1)
+            event_sink('position_corrected', {'x': x, 'y': y}, room=session_id)
+        
         # 플레이어 위치 업데이트
-        game_world['players'][session_id]['x'] = data['x']
-        game_world['players'][session_id]['y'] = data['y']
+        player['x'] = x
+        player['y'] = y
+        if not player.get('in_duel'):
+            update_player_position(session_id, x, y)
+            event_log.record_move('p', player['username'], x, y)
         
-        # 다른 플레이어들에게 위치 업데이트 전송
-        emit('player_moved', {
+        # 같은 방 (월드 또는 듀얼 인스턴스)의 다른 플레이어들에게 위치 업데이트 전송
+        room = duel_room(player['in_duel']) if player.get('in_duel') else 'game_world'
+        event_sink('player_moved', {
             'session_id': session_id,
-            'x': data['x'],
-            'y': data['y']
-        }, room='game_world', include_self=False)
+            'x': x,
+            'y': y
+        }, room=room, skip_sid=session_id)
 
-@socketio.on('attack_monster')
-def on_attack_monster(data):
-    monster_id = data['monster_id']
-    session_id = request.sid
-    
-    if monster_id in game_world['monsters'] and session_id in game_world['players']:
+def save_player_progress(player, score_gained, reason, save_stats=True):
+    """월드 플레이어의 점수를 원장에, 레벨/경험치/HP를 플레이어 파일에 반영"""
+    if not persist_progress:
+        return
+    username = player['username']
+    currency.apply(username, {'score': score_gained}, reason)
+    if save_stats:
+        path = user_data_path(username, 'player')
+        player_data = load_player_data_file(path)
+        player_data['level'] = player['level']
+        player_data['exp'] = player['exp']
+        player_data['hp'] = player['hp']
+        save_data(player_data, path)
+
+def validate_world_action(session_id, player, action, grid, target_id, max_range):
+    """클라이언트가 요청한 월드 행동 검사 (대상 존재, 서버 위치 기준 사거리, 쿨다운). 거부는 집계만 한다"""
+    if player.get('in_duel'):
+        combat.reject(session_id, action, 'state')
+        return False
+    position = grid.position(target_id) if isinstance(target_id, str) else None
+    if position is None:
+        combat.reject(session_id, action, 'missing')
+        return False
+    if distance_between(position, (player['x'], player['y'])) > max_range:
+        combat.reject(session_id, action, 'range')
+        return False
+    # 쿨다운은 마지막에 확인 (거부된 시도는 쿨다운을 소모하지 않는다)
+    return combat.check(session_id, action, world_clock())
+
+def player_attack_monster(session_id, monster_id):
+    player = game_world['players'].get(session_id)
+    if player and validate_world_action(session_id, player, 'attack_monster', monster_grid, monster_id, MONSTER_ATTACK_RANGE):
         monster = game_world['monsters'][monster_id]
-        player = game_world['players'][session_id]
         
         # 몬스터 데미지 (보스는 더 적은 데미지)
         if monster.get('monster_type') == 'boss':
-            damage = random.randint(3, 8)  # 보스는 더 강함
+            damage = world_rng.randint(3, 8)  # 보스는 더 강함
         else:
-            damage = random.randint(5, 15)
+            damage = world_rng.randint(5, 15)
         monster['hp'] -= damage
+        event_log.append('damage', k='monster', id=monster_id, by=player['username'], dmg=damage, hp=monster['hp'])
         
         if monster['hp'] <= 0:
             # 몬스터 처치 - 경험치와 점수 획득 (보스는 더 많은 보상)
             if monster.get('monster_type') == 'boss':
-                exp_gained = random.randint(50, 75)  # 보스 보상
-                score_gained = random.randint(20, 30)
+                exp_gained = world_rng.randint(50, 75)  # 보스 보상
+                score_gained = world_rng.randint(20, 30)
             else:
-                exp_gained = random.randint(15, 25)
-                score_gained = random.randint(3, 8)
+                exp_gained = world_rng.randint(15, 25)
+                score_gained = world_rng.randint(3, 8)
             
             player['exp'] += exp_gained
             
@@ -838,49 +1863,41 @@ def on_attack_monster(data):
                 player['exp'] = 0
                 player['hp'] = 100  # 레벨업시 HP 회복
                 
-                emit('level_up', {
+                event_sink('level_up', {
                     'new_level': player['level']
                 }, room=session_id)
             
             # 플레이어 데이터 저장
-            if 'username' in session:
-                player_data = load_user_player_data()
-                player_data['level'] = player['level']
-                player_data['exp'] = player['exp']
-                player_data['hp'] = player['hp']
-                player_data['score'] += score_gained
-                save_user_player_data(player_data)
+            save_player_progress(player, score_gained, 'monster_kill')
             
-            # 몬스터 제거
-            del game_world['monsters'][monster_id]
+            # 몬스터 제거 (개체는 풀로 돌아가 다음 스폰에 재사용)
+            monster_spawner.release(monster_id)
+            remove_monster_from_ai(monster_id)
+            event_log.append('kill', id=monster_id, by=player['username'], exp=exp_gained, score=score_gained)
             
-            # 새 몬스터 생성
-            spawn_monsters()
-            
-            # 모든 플레이어에게 업데이트 전송
-            emit('monster_killed', {
+            # 모든 플레이어에게 업데이트 전송 (새 개체가 생기기 전에 먼저)
+            event_sink('monster_killed', {
                 'monster_id': monster_id,
                 'killer': player['username'],
                 'exp_gained': exp_gained,
                 'score_gained': score_gained
             }, room='game_world')
             
+            # 새 몬스터 생성
+            spawn_monsters()
+            
         else:
             # 몬스터가 살아있음 - 데미지만 전송
-            emit('monster_damaged', {
+            event_sink('monster_damaged', {
                 'monster_id': monster_id,
                 'damage': damage,
                 'hp': monster['hp']
             }, room='game_world')
 
-@socketio.on('collect_item')
-def on_collect_item(data):
-    item_id = data['item_id']
-    session_id = request.sid
-    
-    if item_id in game_world['items'] and session_id in game_world['players']:
+def player_collect_item(session_id, item_id):
+    player = game_world['players'].get(session_id)
+    if player and validate_world_action(session_id, player, 'collect_item', item_grid, item_id, ITEM_COLLECT_RANGE):
         item = game_world['items'][item_id]
-        player = game_world['players'][session_id]
         
         # 아이템 효과 적용
         if item['type'] == '💎':
@@ -893,27 +1910,25 @@ def on_collect_item(data):
         elif item['type'] == '💰':
             score_bonus = 25
         
-        # 플레이어 데이터 업데이트
-        if 'username' in session:
-            player_data = load_user_player_data()
-            player_data['score'] += score_bonus
-            if item['type'] == '🛡️':
-                player_data['hp'] = player['hp']
-            save_user_player_data(player_data)
-        
-        # 아이템 제거
-        del game_world['items'][item_id]
+        # 플레이어 데이터 업데이트 (HP가 바뀐 경우에만 플레이어 파일 저장)
+        save_player_progress(player, score_bonus, 'item_collect', save_stats=item['type'] == '🛡️')
         
-        # 새 아이템 생성
-        spawn_items()
+        # 아이템 제거 (개체는 풀로 돌아가므로 이후에는 item_type만 사용)
+        item_type = item['type']
+        item_spawner.release(item_id)
+        item_grid.remove(item_id)
+        event_log.append('collect', id=item_id, by=player['username'], bonus=score_bonus)
         
-        # 모든 플레이어에게 업데이트 전송
-        emit('item_collected', {
+        # 모든 플레이어에게 업데이트 전송 (새 개체가 생기기 전에 먼저)
+        event_sink('item_collected', {
             'item_id': item_id,
             'collector': player['username'],
-            'item_type': item['type'],
+            'item_type': item_type,
             'score_bonus': score_bonus
         }, room='game_world')
+        
+        # 새 아이템 생성
+        spawn_items()
 
 @socketio.on('chat_message')
 def on_chat_message(data):
@@ -921,8 +1936,8 @@ def on_chat_message(data):
     if session_id in game_world['players']:
         player = game_world['players'][session_id]
         
-        # 채팅 메시지를 모든 플레이어에게 전송
-        emit('chat_message', {
+        # 채팅 메시지를 모든 플레이어에게 전송 (느린 클라이언트는 대기열로)
+        event_sink('chat_message', {
             'username': player['username'],
             'message': data['message']
         }, room='game_world')
@@ -937,13 +1952,9 @@ def on_request_duel(data):
         return
     
     # 대상 플레이어 찾기
-    target_player_id = None
-    for player_id, player in game_world['players'].items():
-        if player['username'] == target_username:
-            target_player_id = player_id
-            break
+    target_player_id = get_user_session(target_username)
     
-    if not target_player_id:
+    if target_player_id not in game_world['players']:
         emit('duel_error', {'message': '플레이어를 찾을 수 없습니다.'})
         return
     
@@ -970,10 +1981,10 @@ def on_request_duel(data):
     })
     
     # 대상자에게 알림
-    emit('duel_request_received', {
+    emit_to_user(target_username, 'duel_request_received', {
         'from_username': game_world['players'][session_id]['username'],
         'request_id': request_id
-    }, room=target_player_id)
+    })
 
 @socketio.on('accept_duel')
 def on_accept_duel(data):
@@ -987,31 +1998,43 @@ def on_accept_duel(data):
         emit('duel_error', {'message': '듀얼 요청을 찾을 수 없습니다.'})
         return
     
-    request = game_world['duel_requests'][request_id]
-    if request['to_player'] != session_id:
+    duel_request = game_world['duel_requests'][request_id]
+    if duel_request['to_player'] != session_id:
         emit('duel_error', {'message': '권한이 없습니다.'})
         return
     
+    if game_world['players'][session_id].get('in_duel'):
+        emit('duel_error', {'message': '이미 듀얼 중입니다.'})
+        return
+    
+    if not free_arenas:
+        emit('duel_error', {'message': '모든 아레나가 사용 중입니다. 잠시 후 다시 시도하세요.'})
+        return
+    
+    if duel_request['from_player'] not in game_world['players'] or game_world['players'][duel_request['from_player']].get('in_duel'):
+        del game_world['duel_requests'][request_id]
+        emit('duel_error', {'message': '상대방이 듀얼을 시작할 수 없는 상태입니다.'})
+        return
+    
     # 듀얼 시작
     duel_id = accept_duel_request(request_id)
     if duel_id:
         # 양쪽 플레이어에게 듀얼 시작 알림
-        emit('duel_started', {
+        event_sink('duel_started', {
             'duel_id': duel_id,
-            'opponent': game_world['players'][request['from_player']]['username']
+            'opponent': game_world['players'][duel_request['from_player']]['username']
         }, room=session_id)
         
-        emit('duel_started', {
+        event_sink('duel_started', {
             'duel_id': duel_id,
             'opponent': game_world['players'][session_id]['username']
-        }, room=request['from_player'])
+        }, room=duel_request['from_player'])
         
-        # 모든 플레이어에게 게임 상태 업데이트
-        emit('game_state', {
-            'players': game_world['players'],
-            'monsters': game_world['monsters'],
-            'items': game_world['items'],
-            'duels': game_world['duels']
+        # 두 플레이어에게는 아레나 인스턴스 상태를, 월드에는 두 플레이어가 빠졌다는 알림만 전송
+        event_sink('game_state', duel_state(duel_id), room=duel_room(duel_id))
+        event_sink('duel_instance_opened', {
+            'duel_id': duel_id,
+            'session_ids': [duel_request['from_player'], session_id]
         }, room='game_world')
 
 @socketio.on('decline_duel')
@@ -1022,14 +2045,14 @@ def on_decline_duel(data):
     if request_id not in game_world['duel_requests']:
         return
     
-    request = game_world['duel_requests'][request_id]
-    if request['to_player'] != session_id:
+    duel_request = game_world['duel_requests'][request_id]
+    if duel_request['to_player'] != session_id:
         return
     
     # 신청자에게 거절 알림
-    emit('duel_declined', {
+    event_sink('duel_declined', {
         'from_username': game_world['players'][session_id]['username']
-    }, room=request['from_player'])
+    }, room=duel_request['from_player'])
     
     # 요청 삭제
     del game_world['duel_requests'][request_id]
@@ -1037,85 +2060,143 @@ def on_decline_duel(data):
 @socketio.on('attack_player')
 def on_attack_player(data):
     session_id = request.sid
-    target_player_id = data['target_player_id']
+    target_player_id = data.get('target_player_id')
     
-    if session_id not in game_world['players'] or target_player_id not in game_world['players']:
+    if session_id not in game_world['players']:
+        return
+    if not isinstance(target_player_id, str) or target_player_id not in game_world['players']:
+        combat.reject(session_id, 'attack_player', 'missing')
         return
     
     attacker = game_world['players'][session_id]
     target = game_world['players'][target_player_id]
     
     # 듀얼 중인지 확인
-    if not attacker.get('in_duel') or attacker.get('in_duel') != target.get('in_duel'):
+    if not attacker.get('in_duel') or attacker.get('in_duel') != target.get('in_duel') or target_player_id == session_id:
+        combat.reject(session_id, 'attack_player', 'state')
         emit('duel_error', {'message': '듀얼 중이 아닙니다.'})
         return
     
+    # 사거리 (아레나 좌표) 와 쿨다운 확인
+    if distance_between((attacker['x'], attacker['y']), (target['x'], target['y'])) > DUEL_ATTACK_RANGE:
+        combat.reject(session_id, 'attack_player', 'range')
+        return
+    if not combat.check(session_id, 'attack_player', world_clock()):
+        return
+    
+    duel_id = attacker['in_duel']
+    
     # 데미지 계산
-    damage = random.randint(15, 25)
+    damage = world_rng.randint(15, 25)
     target['hp'] -= damage
     
     if target['hp'] <= 0:
         target['hp'] = 0
-        # 듀얼 종료
-        duel_id = attacker['in_duel']
-        end_duel(duel_id, session_id)
-        
         # 승리/패배 알림
-        emit('duel_ended', {
+        event_sink('duel_ended', {
             'winner': attacker['username'],
             'loser': target['username'],
             'result': 'victory'
         }, room=session_id)
         
-        emit('duel_ended', {
+        event_sink('duel_ended', {
             'winner': attacker['username'],
             'loser': target['username'],
             'result': 'defeat'
         }, room=target_player_id)
         
+        # 듀얼 종료
+        end_duel(duel_id, session_id)
+        
         # 승리 보상
         if 'username' in session:
-            player_data = load_user_player_data()
-            player_data['score'] += 50  # 듀얼 승리 보상
-            save_user_player_data(player_data)
+            change_balance({'score': 50}, 'duel_victory')  # 듀얼 승리 보상
     else:
-        # 데미지 알림
-        emit('player_damaged', {
+        # 데미지 알림 (듀얼 방 안에만), 전체 상태는 인스턴스 틱에서 한 번에 동기화
+        event_sink('player_damaged', {
             'attacker': attacker['username'],
             'target': target['username'],
             'damage': damage,
             'hp': target['hp']
-        }, room='game_world')
+        }, room=duel_room(duel_id))
+        game_world['duels'][duel_id]['dirty'] = True
+
+@socketio.on('spectate_duel')
+def on_spectate_duel(data):
+    """듀얼 관전 신청 (원하는 플레이어만 듀얼 방 이벤트를 받는다)"""
+    session_id = request.sid
+    duel_id = data['duel_id']
+    player = game_world['players'].get(session_id)
+    if not player or player.get('in_duel') or player.get('spectating'):
+        return
     
-    # 게임 상태 업데이트
-    emit('game_state', {
-        'players': game_world['players'],
-        'monsters': game_world['monsters'],
-        'items': game_world['items'],
-        'duels': game_world['duels']
-            }, room='game_world')
+    duel = game_world['duels'].get(duel_id)
+    if not duel:
+        emit('duel_error', {'message': '듀얼을 찾을 수 없습니다.'})
+        return
+    
+    if len(duel['spectators']) >= MAX_DUEL_SPECTATORS:
+        emit('duel_error', {'message': '관전 인원이 가득 찼습니다.'})
+        return
+    
+    duel['spectators'].append(session_id)
+    player['spectating'] = duel_id
+    join_room(duel_room(duel_id))
+    event_sink('duel_state', duel_state(duel_id), room=session_id)
+
+@socketio.on('stop_spectating')
+def on_stop_spectating():
+    session_id = request.sid
+    player = game_world['players'].get(session_id)
+    if not player or not player.get('spectating'):
+        return
+    
+    duel_id = player.pop('spectating')
+    if duel_id in game_world['duels']:
+        game_world['duels'][duel_id]['spectators'].remove(session_id)
+    leave_room(duel_room(duel_id))
 
 # --- 몬스터 AI 업데이트 소켓 이벤트 ---
 @socketio.on('monster_ai_update')
 def on_monster_ai_update():
+    if request.sid not in game_world['players'] or not combat.check(request.sid, 'monster_ai_update', world_clock()):
+        return
     update_monster_ai()
-    
-    # 모든 플레이어에게 업데이트된 게임 상태 전송
-    emit('game_state', {
-        'players': game_world['players'],
-        'monsters': game_world['monsters'],
-        'items': game_world['items'],
-        'duels': game_world['duels']
-    }, room='game_world')
+    broadcast_world_state()
+
+def broadcast_world_state():
+    """모든 플레이어에게 업데이트된 게임 상태 전송"""
+    event_sink('game_state', world_state(), room='game_world')
 
 @socketio.on('player_damaged')
 def on_player_damaged(data):
-    # 플레이어가 몬스터에게 데미지를 받았을 때
-    emit('player_damaged_event', {
-        'player_id': data['player_id'],
-        'damage': data['damage'],
-        'hp': data['hp']
-    }, room='game_world')
+    # 데미지는 서버가 판정해서 보낸다 (attack_player, player_damaged_by_monster).
+    # 클라이언트가 주장하는 데미지는 다시 방송하지 않고 거부로만 센다
+    combat.reject(request.sid, 'player_damaged', 'client_asserted')
+
+# --- 앱 팩토리 ---
+def create_app(config=None):
+    """Flask 앱 생성. 번역/타일맵/게임 월드는 처음 쓸 때 만들어진다"""
+    global session_store
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+    session_store = SessionStore(app.config['SESSION_DB_FILE'])
+    app.session_interface = ServerSideSessionInterface(session_store)
+    app.register_blueprint(main)
+    transport = dict(TRANSPORT_PROFILES[app.config['SOCKET_TRANSPORT_PROFILE']])
+    game_server['max_buffered_packets'] = transport.pop('max_buffered_packets')
+    socketio.init_app(app, cors_allowed_origins="*", **transport)
+    return app
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    debug = True
+    app = create_app()
+    # 디버그 리로더의 감시 프로세스에서는 작업을 돌리지 않는다
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        if app.config['MAINTENANCE_JOBS']:
+            start_scheduler()
+        if app.config['GAME_SERVER_ENABLED']:
+            start_game_server()
+    socketio.run(app, host='0.0.0.0', port=5001, debug=debug)
\ No newline at end of file
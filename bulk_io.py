@@ -0,0 +1,50 @@
+# bulk_io.py
+"""대량 데이터 처리 도우미 (NDJSON 스트림, 처리 중인 작업 수를 제한한 스레드 풀 map)"""
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def bounded_map(func, items, workers=8, window=None):
+    """items를 스레드 풀에서 func로 처리해서 입력 순서대로 결과를 하나씩 반환.
+
+    동시에 떠 있는 작업은 window개 (기본 workers * 4) 까지만 만들어서
+    입력이 아무리 많아도 메모리 사용량이 일정하다. func가 던진 예외는 그 결과를 꺼낼 때 다시 던져진다.
+    items를 읽다가 난 예외는 이미 시작한 작업의 결과를 다 돌려준 뒤에 던져진다.
+    """
+    window = window or workers * 4
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+        except Exception:
+            # 입력을 읽다가 실패해도 이미 시작한 작업의 결과는 모두 돌려준 뒤 예외를 다시 던진다
+            while pending:
+                yield pending.popleft().result()
+            raise
+        while pending:
+            yield pending.popleft().result()
+
+
+def dump_line(record):
+    return json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n'
+
+
+def iter_ndjson(lines):
+    """(줄 번호, 레코드, 오류) 를 하나씩 반환. 빈 줄은 건너뛴다"""
+    for line_no, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError as e:
+                yield line_no, None, f'invalid UTF-8: {e}'
+                continue
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield line_no, None, f'invalid JSON: {e}'
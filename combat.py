@@ -0,0 +1,78 @@
+# combat.py
+"""서버 판정 전투 규칙 (행동 쿨다운, 사거리 판정, 거부된 행동 집계)"""
+import math
+from collections import Counter
+
+
+def distance_between(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+class CombatGuard:
+    """세션별 행동 쿨다운과 거부 집계.
+
+    클라이언트가 보낸 행동은 check()를 통과해야만 처리한다. 거부된 행동은 방송 없이 세기만 하고,
+    한 집계 구간 (end_window 호출 사이) 에 max_rejections번 넘게 거부된 세션은 end_window가 돌려준다.
+    쿨다운 거부는 지연으로 패킷이 몰려 와도 생기므로 연결 종료 기준에는 넣지 않는다.
+    """
+
+    def __init__(self, cooldowns, max_rejections=50, move_speed=700, move_burst=250):
+        self.cooldowns = cooldowns  # {action: 최소 간격 (초)}
+        self.max_rejections = max_rejections
+        self.move_speed = move_speed  # 초당 쌓이는 이동 허용 거리 (px)
+        self.move_burst = move_burst  # 한 번에 몰아서 쓸 수 있는 최대 이동 거리 (지연으로 몰려 온 이동, 대쉬)
+        self.move_allowance = {}  # {session_id: (남은 허용 거리, 마지막 갱신 시각)}
+        self.last_action = {}  # {session_id: {action: 마지막으로 허용한 시각}}
+        self.window_rejections = Counter()  # {session_id: 이번 구간 거부 수}
+        self.accepted = Counter()  # {action: 허용 수}
+        self.rejected = Counter()  # {(action, reason): 거부 수}
+        self.dropped_sessions = 0
+
+    def check(self, session_id, action, now):
+        """쿨다운이 지났으면 시각을 기록하고 True, 아니면 'cooldown'으로 거부하고 False"""
+        times = self.last_action.setdefault(session_id, {})
+        if now - times.get(action, float('-inf')) < self.cooldowns.get(action, 0):
+            self.reject(session_id, action, 'cooldown', count=False)
+            return False
+        times[action] = now
+        self.accepted[action] += 1
+        return True
+
+    def allow_move(self, session_id, distance, now):
+        """요청한 이동 거리 중 허용하는 거리 (토큰 버킷). 줄였으면 'speed'로 기록 (연결 종료 기준에는 넣지 않음)"""
+        allowance, last = self.move_allowance.get(session_id, (self.move_burst, now))
+        allowance = min(self.move_burst, allowance + (now - last) * self.move_speed)
+        allowed = min(distance, allowance)
+        self.move_allowance[session_id] = (allowance - allowed, now)
+        if allowed < distance:
+            self.reject(session_id, 'player_move', 'speed', count=False)
+        return allowed
+
+    def reject(self, session_id, action, reason, count=True):
+        """거부 기록. count=False면 통계에만 남기고 연결 종료 기준에는 넣지 않는다"""
+        self.rejected[(action, reason)] += 1
+        if count:
+            self.window_rejections[session_id] += 1
+
+    def end_window(self):
+        """구간을 마치고 거부가 max_rejections번을 넘은 세션 목록 반환"""
+        abusive = [session_id for session_id, count in self.window_rejections.items() if count > self.max_rejections]
+        self.window_rejections.clear()
+        self.dropped_sessions += len(abusive)
+        return abusive
+
+    def forget(self, session_id):
+        self.last_action.pop(session_id, None)
+        self.move_allowance.pop(session_id, None)
+        self.window_rejections.pop(session_id, None)
+
+    def stats(self):
+        rejected = {}
+        for (action, reason), count in self.rejected.items():
+            rejected.setdefault(action, {})[reason] = count
+        return {
+            'accepted': dict(self.accepted),
+            'rejected': rejected,
+            'rejected_total': sum(self.rejected.values()),
+            'dropped_sessions': self.dropped_sessions
+        }
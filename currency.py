@@ -0,0 +1,238 @@
+# currency.py
+"""티켓/점수 재화 원장 (유저별 추가 전용 NDJSON, 잔액 캐시, 멱등 키, 구매한 아이템)"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows - 프로세스 간 잠금 없음 (한 프로세스로 실행할 때만 안전)
+    fcntl = None
+
+CURRENCIES = ('tickets', 'score')
+IDEMPOTENCY_KEY_TTL = 2 * 24 * 3600  # 멱등 키 보관 기간 (초), 압축 시 이보다 오래된 키는 버린다
+
+
+class CurrencyLedger:
+    """유저별 재화 잔액을 추가 전용 원장으로 관리한다.
+
+    잔액 변경은 원장 파일에 한 줄을 덧붙이는 것으로 끝나고 (전체 문서 재작성 없음),
+    잔액은 메모리에 캐시해 둔다. 같은 유저의 변경은 유저별 잠금 (스레드 잠금 + 원장 옆 .lock 파일 잠금) 으로
+    프로세스 사이에서도 직렬화되고, 캐시는 원장 파일 (inode, 크기) 이 마지막으로 본 것과 같을 때만 쓴다.
+    그래서 웹 프로세스와 게임 서버 프로세스가 같은 유저의 잔액을 바꿔도 변경이 사라지지 않는다.
+
+    구매한 아이템도 값을 치르는 줄에 같이 적는다 ("g"). 그래서 차감과 소유가 한 번에 기록되고,
+    플레이어 파일을 다른 요청이 덮어써도 구매가 사라지지 않는다.
+
+    원장 한 줄: {"s": 순번, "t": 시각, "d": {재화: 변화량}, "b": {재화: 변경 후 잔액}, "r": 사유, "k": 멱등 키, "g": [아이템]}
+    압축 후 첫 줄은 {"s", "t", "c": true, "b", "keys": {멱등 키: 시각}, "items": [아이템]} 형태의 체크포인트다.
+    초기화 줄 ("x": 남길 키 접두어) 은 "items"로 소유 아이템을 새로 정한다.
+    """
+
+    def __init__(self, path_for, initial_balances):
+        self.path_for = path_for  # username -> 원장 파일 경로
+        self.initial_balances = initial_balances  # username -> 원장이 없을 때의 시작 잔액 (기존 플레이어 파일)
+        self._accounts = {}  # {username: {'seq', 'balances', 'keys', 'items', 'lines'}}
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock(self, username):
+        with self._locks_guard:
+            lock = self._locks.get(username)
+            if lock is None:
+                lock = self._locks[username] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def _locked(self, username):
+        """유저 원장 잠금 (같은 프로세스의 스레드끼리, 그리고 다른 프로세스와도)"""
+        with self._lock(username):
+            if fcntl is None:
+                yield
+                return
+            with open(self.path_for(username) + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stat(self, username):
+        try:
+            st = os.stat(self.path_for(username))
+        except OSError:
+            return None
+        return st.st_ino, st.st_size
+
+    def _load(self, username, cache=True):
+        """계정 상태. 캐시가 없거나 원장 파일이 바뀌었으면 (다른 프로세스의 기록) 다시 읽는다 (잠금 안에서 호출).
+
+        cache=False면 새로 읽은 상태를 캐시에 넣지 않는다 (전체 유저 순회용).
+        """
+        account = self._accounts.get(username)
+        if account is None or account['stat'] != self._stat(username):
+            account = self._read(username)
+            if cache or username in self._accounts:
+                self._accounts[username] = account
+        return account
+
+    def _read(self, username):
+        account = {'seq': 0, 'balances': None, 'keys': {}, 'items': [], 'lines': 0, 'stat': self._stat(username)}
+        path = self.path_for(username)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # 기록 도중 종료된 마지막 줄
+                    account['seq'] = entry['s']
+                    account['balances'] = entry['b']
+                    account['lines'] += 1
+                    if entry.get('c'):
+                        account['keys'] = dict(entry.get('keys', {}))
+                        account['items'] = list(entry.get('items', []))
+                    elif 'x' in entry:
+                        account['keys'] = self._kept_keys(account['keys'], entry['x'])
+                        account['items'] = list(entry.get('items', []))
+                    if entry.get('k'):
+                        account['keys'][entry['k']] = entry['t']
+                    for item in entry.get('g', ()):
+                        if item not in account['items']:
+                            account['items'].append(item)
+        if account['balances'] is None:
+            initial = self.initial_balances(username)
+            account['balances'] = {currency: int(initial.get(currency, 0)) for currency in CURRENCIES}
+        return account
+
+    def balances(self, username):
+        with self._locked(username):
+            return dict(self._load(username)['balances'])
+
+    def balance(self, username, currency):
+        return self.balances(username)[currency]
+
+    def holdings(self, username, cache=True):
+        """잔액과 소유 아이템 ({재화: 잔액, 'items': [아이템]}).
+
+        cache=False면 캐시에 없는 유저의 원장을 읽기만 하고 캐시에 넣지 않는다 (전체 유저 순회용).
+        """
+        with self._locked(username):
+            account = self._load(username, cache=cache)
+            return dict(account['balances'], items=list(account['items']))
+
+    def _append(self, username, account, entry):
+        with open(self.path_for(username), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + '\n')
+        account['lines'] += 1
+        account['stat'] = self._stat(username)
+
+    def apply(self, username, deltas, reason, key=None, clamp=False, grant=None, cache=True):
+        """잔액 변경을 원자적으로 적용.
+
+        잔액이 모자라면 적용하지 않고 ok=False를 돌려준다. clamp=True면 0 아래로 내려가는 만큼만 깎는다.
+        같은 멱등 키로 다시 요청하면 적용하지 않고 duplicate=True와 현재 잔액을 돌려준다.
+        grant를 주면 같은 줄에 그 아이템의 소유를 기록한다 (이미 가지고 있으면 duplicate=True로 아무것도 하지 않음).
+        cache=False면 캐시에 없는 유저를 캐시에 넣지 않는다 (전체 유저 순회용).
+        """
+        with self._locked(username):
+            account = self._load(username, cache=cache)
+            balances = account['balances']
+            if (key is not None and key in account['keys']) or (grant is not None and grant in account['items']):
+                return {'ok': True, 'duplicate': True, 'balances': dict(balances)}
+            applied = {}
+            for currency, amount in deltas.items():
+                if not amount:
+                    continue
+                if balances[currency] + amount < 0:
+                    if not clamp:
+                        return {'ok': False, 'duplicate': False, 'balances': dict(balances), 'error': f'Not enough {currency}'}
+                    amount = -balances[currency]
+                if amount:
+                    applied[currency] = amount
+            new_balances = dict(balances)
+            for currency, amount in applied.items():
+                new_balances[currency] += amount
+            now = round(time.time(), 3)
+            if applied or key is not None or grant is not None:
+                entry = {'s': account['seq'] + 1, 't': now, 'd': applied, 'b': new_balances, 'r': reason}
+                if key is not None:
+                    entry['k'] = key
+                if grant is not None:
+                    entry['g'] = [grant]
+                self._append(username, account, entry)
+                account['seq'] += 1
+                account['balances'] = new_balances
+                if key is not None:
+                    account['keys'][key] = now
+                if grant is not None:
+                    account['items'].append(grant)
+            return {'ok': True, 'duplicate': False, 'balances': dict(new_balances)}
+
+    @staticmethod
+    def _kept_keys(keys, keep_prefixes):
+        return {key: ts for key, ts in keys.items() if key.startswith(tuple(keep_prefixes))}
+
+    def reset(self, username, reason='reset', keep_key_prefixes=(), balances=None, items=()):
+        """모든 재화를 0으로 (balances를 주면 그 잔액으로), 소유 아이템을 items로 되돌림 (원장에는 변경 기록으로 남는다).
+
+        keep_key_prefixes로 시작하지 않는 멱등 키는 잊는다.
+        """
+        with self._locked(username):
+            account = self._load(username)
+            target = {currency: int((balances or {}).get(currency, 0)) for currency in CURRENCIES}
+            deltas = {currency: target[currency] - account['balances'][currency]
+                      for currency in CURRENCIES if target[currency] != account['balances'][currency]}
+            entry = {'s': account['seq'] + 1, 't': round(time.time(), 3), 'd': deltas,
+                     'b': target, 'r': reason, 'x': list(keep_key_prefixes), 'items': list(items)}
+            self._append(username, account, entry)
+            account['seq'] += 1
+            account['balances'] = entry['b']
+            account['keys'] = self._kept_keys(account['keys'], keep_key_prefixes)
+            account['items'] = list(items)
+            return {'ok': True, 'duplicate': False, 'balances': dict(entry['b'])}
+
+    def has_key(self, username, key):
+        """멱등 키가 (보관 기간 안에) 기록되어 있는지"""
+        with self._locked(username):
+            return key in self._load(username)['keys']
+
+    def history(self, username, limit=50):
+        """최근 거래 내역 (체크포인트 제외, 최신순)"""
+        path = self.path_for(username)
+        if not os.path.exists(path):
+            return []
+        with self._locked(username):
+            with open(path, 'r', encoding='utf-8') as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+        return [entry for entry in reversed(entries) if not entry.get('c')][:limit]
+
+    def compact(self, username, min_lines=100):
+        """원장이 min_lines 줄 이상이면 체크포인트 한 줄로 압축. 압축한 경우 잔액 반환.
+
+        캐시에 없는 유저는 캐시에 넣지 않는다 (전체 유저를 도는 압축 작업이 모든 원장을 메모리에 올리지 않도록).
+        """
+        with self._locked(username):
+            account = self._load(username, cache=False)
+            if account['lines'] < min_lines:
+                return None
+            now = time.time()
+            keys = {key: ts for key, ts in account['keys'].items() if now - ts < IDEMPOTENCY_KEY_TTL}
+            checkpoint = {'s': account['seq'], 't': round(now, 3), 'c': True, 'b': account['balances'], 'keys': keys,
+                          'items': account['items']}
+            path = self.path_for(username)
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(checkpoint, separators=(',', ':'), ensure_ascii=False) + '\n')
+            os.replace(tmp_path, path)
+            account['keys'] = keys
+            account['lines'] = 1
+            account['stat'] = self._stat(username)
+            return dict(account['balances'])
+
+    def evict(self, username):
+        """잔액 캐시에서 제거 (다음 조회 때 원장에서 다시 읽음)"""
+        with self._lock(username):
+            self._accounts.pop(username, None)
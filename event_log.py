@@ -0,0 +1,193 @@
+# event_log.py
+"""MMORPG 월드 변경 이벤트 로그 (NDJSON, 추가 전용) 와 스냅샷/복구/리플레이"""
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+EVENT_TYPES = ('spawn', 'move', 'damage', 'kill', 'collect', 'duel_start', 'duel_end')
+
+
+def empty_state():
+    return {'seq': 0, 'monsters': {}, 'items': {}, 'positions': {}, 'duels': {}}
+
+
+def apply_event(state, event):
+    """이벤트 하나를 월드 상태에 반영 (복구와 리플레이가 같은 함수를 쓴다)"""
+    kind = event['e']
+    if kind == 'spawn':
+        target = state['monsters'] if event['k'] == 'monster' else state['items']
+        target[event['id']] = event['d']
+    elif kind == 'move':
+        # {'m': {monster_id: [x, y]}, 'p': {username: [x, y]}}
+        for monster_id, (x, y) in event.get('m', {}).items():
+            monster = state['monsters'].get(monster_id)
+            if monster:
+                monster['x'], monster['y'] = x, y
+        for username, (x, y) in event.get('p', {}).items():
+            state['positions'][username] = {'x': x, 'y': y}
+    elif kind == 'damage':
+        if event['k'] == 'monster' and event['id'] in state['monsters']:
+            state['monsters'][event['id']]['hp'] = event['hp']
+    elif kind == 'kill':
+        state['monsters'].pop(event['id'], None)
+    elif kind == 'collect':
+        state['items'].pop(event['id'], None)
+    elif kind == 'duel_start':
+        state['duels'][event['id']] = {'players': event['players'], 'world_pos': event['world_pos']}
+    elif kind == 'duel_end':
+        duel = state['duels'].pop(event['id'], None)
+        # 듀얼 참가자는 듀얼 전 월드 위치로 돌아간다
+        if duel:
+            state['positions'].update(duel['world_pos'])
+    state['seq'] = event['s']
+    return state
+
+
+def iter_events(path, after_seq=0):
+    """로그 파일의 이벤트를 순서대로 하나씩 반환 (마지막 줄이 깨져 있으면 무시)"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 기록 도중 종료된 마지막 줄
+            if event['s'] > after_seq:
+                yield event
+
+
+class EventLog:
+    """월드 변경 이벤트를 NDJSON으로 추가 기록하고 주기적으로 스냅샷을 남긴다.
+
+    이동은 매번 기록하지 않고 flush() 때까지 엔티티별 마지막 위치만 모아서 한 줄로 남긴다.
+    """
+
+    def __init__(self, log_path, snapshot_path, keep_segments=5):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self.keep_segments = keep_segments  # 보관할 이전 로그 조각 수 (리플레이/분석용)
+        self.seq = 0
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._pending_moves = {'m': {}, 'p': {}}
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.log_path, 'a', encoding='utf-8')
+        return self._file
+
+    def append(self, kind, **fields):
+        with self._lock:
+            self.seq += 1
+            fields['s'] = self.seq
+            fields['t'] = round(time.time(), 3)
+            fields['e'] = kind
+            self._buffer.append(json.dumps(fields, separators=(',', ':'), ensure_ascii=False))
+            self.counts[kind] += 1
+
+    def record_move(self, kind, entity_id, x, y):
+        """이동 기록 ('m' = 몬스터, 'p' = 플레이어). 다음 flush 때 한 번에 기록"""
+        self._pending_moves[kind][entity_id] = [round(x, 1), round(y, 1)]
+
+    def flush(self):
+        pending, self._pending_moves = self._pending_moves, {'m': {}, 'p': {}}
+        if pending['m'] or pending['p']:
+            self.append('move', **{key: value for key, value in pending.items() if value})
+        with self._lock:
+            if not self._buffer:
+                return
+            f = self._open()
+            f.write('\n'.join(self._buffer) + '\n')
+            f.flush()
+            self._buffer = []
+
+    def snapshot(self, state):
+        """현재 월드 상태를 스냅샷으로 저장하고 로그를 새 조각으로 넘긴다"""
+        self.flush()
+        with self._lock:
+            state = dict(state, seq=self.seq)
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, separators=(',', ':'), ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+            # 스냅샷 이전 이벤트는 복구에 필요 없으므로 조각으로 분리
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.log_path):
+                os.replace(self.log_path, f'{self.log_path}.{self.seq:012d}')
+            for old_segment in self.segments()[:-self.keep_segments or None]:
+                os.remove(old_segment)
+
+    def segments(self):
+        """분리된 이전 로그 조각 목록 (오래된 순)"""
+        return sorted(glob.glob(glob.escape(self.log_path) + '.*[0-9]'))
+
+    def recover(self):
+        """최신 스냅샷을 읽고 이후 이벤트를 다시 적용한 월드 상태 반환. 기록이 없으면 None"""
+        state = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        replayed = 0
+        for event in iter_events(self.log_path, after_seq=state['seq'] if state else 0):
+            if state is None:
+                state = empty_state()
+            apply_event(state, event)
+            replayed += 1
+        if state is not None:
+            self.seq = state['seq']
+            print(f"Recovered world at seq {self.seq} ({replayed} events replayed)")
+        return state
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def replay(paths, snapshot_path=None):
+    """오프라인 리플레이: 이벤트를 순서대로 적용하면서 종류별 건수와 처리 시간을 집계"""
+    state = empty_state()
+    if snapshot_path:
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    counts = Counter()
+    durations = Counter()
+    for path in paths:
+        for event in iter_events(path, after_seq=state['seq']):
+            started = time.perf_counter()
+            apply_event(state, event)
+            durations[event['e']] += time.perf_counter() - started
+            counts[event['e']] += 1
+    return state, counts, durations
+
+
+def main(argv):
+    """사용법: python event_log.py replay [--snapshot world_snapshot.json] world_events.ndjson.* world_events.ndjson"""
+    if len(argv) < 2 or argv[0] != 'replay':
+        print(main.__doc__)
+        return 1
+    args = argv[1:]
+    snapshot_path = None
+    if args[0] == '--snapshot':
+        snapshot_path, args = args[1], args[2:]
+    state, counts, durations = replay(args, snapshot_path)
+    for kind in sorted(counts):
+        print(f"{kind:12s} {counts[kind]:8d} events {durations[kind] * 1000:10.2f} ms")
+    print(f"final seq {state['seq']}: {len(state['monsters'])} monsters, {len(state['items'])} items, "
+          f"{len(state['positions'])} player positions, {len(state['duels'])} open duels")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
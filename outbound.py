@@ -0,0 +1,142 @@
+# outbound.py
+"""느린 클라이언트용 송신 대기열 (같은 대상의 이전 상태 메시지는 최신 것으로 합친다)"""
+import itertools
+import json
+import threading
+from collections import OrderedDict
+
+
+def payload_size(data):
+    """메시지 크기 추정 (바이트)"""
+    return len(json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str))
+
+
+class ClientQueue:
+    """클라이언트 하나의 대기열. {합치기 키: (event, data, size)} 를 보낼 순서대로 둔다"""
+
+    def __init__(self):
+        self.messages = OrderedDict()
+        self.bytes = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.saturated_flushes = 0  # 대기열이 가득 찬 채로 지나간 연속 flush 횟수
+
+    def __len__(self):
+        return len(self.messages)
+
+    def put(self, key, event, data, size, max_depth):
+        old = self.messages.pop(key, None)
+        if old is not None:
+            # 이전 상태는 새 상태로 대체 (순서도 새 메시지 기준으로 뒤로)
+            self.bytes -= old[2]
+            self.coalesced += 1
+        elif len(self.messages) >= max_depth:
+            # 가득 차면 가장 오래된 메시지를 버린다 (다음 game_state가 상태를 다시 맞춰 준다)
+            _, dropped = self.messages.popitem(last=False)
+            self.bytes -= dropped[2]
+            self.dropped += 1
+        self.messages[key] = (event, data, size)
+        self.bytes += size
+
+    def drain(self):
+        messages = list(self.messages.values())
+        self.messages.clear()
+        self.bytes = 0
+        return messages
+
+
+class OutboundQueues:
+    """클라이언트별 송신 대기열.
+
+    잘 받는 클라이언트에게는 바로 보내고 (방 단위 emit 한 번), 전송 대기열이 밀린 클라이언트의
+    메시지만 여기 모아 둔다. coalesce_keys에 있는 이벤트는 같은 키의 이전 메시지를 대체하므로
+    대기열 길이는 max_depth를 넘지 않는다.
+
+    소켓 핸들러 스레드와 flush를 부르는 틱 루프가 동시에 쓰므로 대기열은 잠금 안에서만 바꾸고,
+    slow는 바꿀 때마다 새 frozenset으로 통째로 바꿔 끼워서 읽는 쪽은 잠금 없이 순회할 수 있다.
+    """
+
+    def __init__(self, coalesce_keys, max_depth=32, backlog_packets=8, max_saturated_flushes=20):
+        self.coalesce_keys = coalesce_keys  # {event: data -> 합치기 키}
+        self.max_depth = max_depth
+        self.backlog_packets = backlog_packets  # 전송 대기열이 이보다 길면 느린 클라이언트로 본다
+        self.max_saturated_flushes = max_saturated_flushes
+        self.queues = {}  # {session_id: ClientQueue}
+        self.slow = frozenset()  # 메시지를 대기열로 보내야 하는 클라이언트 (flush 때 통째로 교체)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.dropped_clients = 0
+
+    def put(self, session_id, event, data, size):
+        key_for = self.coalesce_keys.get(event)
+        key = key_for(data) if key_for else next(self._seq)
+        with self._lock:
+            queue = self.queues.get(session_id)
+            if queue is None:
+                queue = self.queues[session_id] = ClientQueue()
+            queue.put(key, event, data, size, self.max_depth)
+
+    def flush(self, session_ids, transport_depth, send, drop):
+        """클라이언트별 전송 대기열 길이를 확인해서 느린 클라이언트 목록을 갱신하고,
+        다시 따라온 클라이언트에게는 모아 둔 메시지를 보낸다.
+
+        대기열이 가득 찬 채로 max_saturated_flushes번 연속 지나간 클라이언트는 drop(session_id)으로 끊는다.
+        """
+        depths = {session_id: transport_depth(session_id) for session_id in session_ids}
+        ready = {}  # {session_id: 보낼 메시지}
+        dropped = []
+        with self._lock:
+            slow = set(self.slow)
+            for session_id, depth in depths.items():
+                queue = self.queues.get(session_id)
+                if depth <= self.backlog_packets:
+                    slow.discard(session_id)
+                    if queue:
+                        queue.saturated_flushes = 0
+                        ready[session_id] = queue.drain()
+                    continue
+                slow.add(session_id)
+                if queue is None:
+                    continue
+                if len(queue) < self.max_depth:
+                    queue.saturated_flushes = 0
+                    continue
+                queue.saturated_flushes += 1
+                if queue.saturated_flushes >= self.max_saturated_flushes:
+                    self.dropped_clients += 1
+                    self.queues.pop(session_id, None)
+                    slow.discard(session_id)
+                    dropped.append(session_id)
+            self.slow = frozenset(slow)
+        # 전송/연결 종료는 잠금 밖에서
+        for session_id, messages in ready.items():
+            for event, data, _ in messages:
+                send(session_id, event, data)
+        for session_id in dropped:
+            drop(session_id)
+
+    def discard(self, session_id):
+        """보내지 않은 메시지 버리기 (방을 옮겨서 이전 상태가 더 이상 맞지 않을 때)"""
+        with self._lock:
+            queue = self.queues.get(session_id)
+            if queue is not None:
+                queue.drain()
+
+    def forget(self, session_id):
+        with self._lock:
+            self.queues.pop(session_id, None)
+            self.slow = self.slow - {session_id}
+
+    def stats(self):
+        with self._lock:
+            clients = {
+                session_id: {'depth': len(queue), 'bytes': queue.bytes, 'coalesced': queue.coalesced,
+                             'dropped': queue.dropped, 'saturated_flushes': queue.saturated_flushes}
+                for session_id, queue in self.queues.items()
+            }
+            return {
+                'clients': clients,
+                'slow_clients': len(self.slow),
+                'queued_bytes': sum(client['bytes'] for client in clients.values()),
+                'dropped_clients': self.dropped_clients
+            }
@@ -0,0 +1,134 @@
+# pathfinding.py
+"""장애물 타일맵과 공유 플로우 필드 (같은 목표를 쫓는 몬스터들이 한 번의 BFS 결과를 같이 쓴다)"""
+import json
+from collections import OrderedDict, deque
+
+# 8방향 이웃 (대각선은 양옆 칸이 모두 비어 있을 때만 허용)
+NEIGHBORS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+BLOCKED_TILES = '#'
+
+
+class TileMap:
+    """문자열 행으로 정의한 타일맵 ('#' = 장애물, '.' = 빈 칸)"""
+
+    def __init__(self, rows, tile_size):
+        self.rows = rows
+        self.tile_size = tile_size
+        self.height = len(rows)
+        self.width = len(rows[0]) if rows else 0
+        self.blocked = [[tile in BLOCKED_TILES for tile in row] for row in rows]
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['rows'], data['tile_size'])
+
+    def to_dict(self):
+        return {'rows': self.rows, 'tile_size': self.tile_size}
+
+    def cell_of(self, x, y):
+        cx = min(max(int(x // self.tile_size), 0), self.width - 1)
+        cy = min(max(int(y // self.tile_size), 0), self.height - 1)
+        return cx, cy
+
+    def cell_center(self, cell):
+        return (cell[0] + 0.5) * self.tile_size, (cell[1] + 0.5) * self.tile_size
+
+    def is_blocked_cell(self, cx, cy):
+        if not (0 <= cx < self.width and 0 <= cy < self.height):
+            return True
+        return self.blocked[cy][cx]
+
+    def is_blocked(self, x, y):
+        return self.is_blocked_cell(*self.cell_of(x, y))
+
+    def passable_neighbors(self, cx, cy):
+        for dx, dy in NEIGHBORS:
+            nx, ny = cx + dx, cy + dy
+            if self.is_blocked_cell(nx, ny):
+                continue
+            if dx and dy and (self.is_blocked_cell(cx + dx, cy) or self.is_blocked_cell(cx, cy + dy)):
+                continue  # 모서리 가로지르기 금지
+            yield nx, ny
+
+
+class FlowField:
+    """목표 칸에서 시작한 BFS 거리 지도. 각 칸에서 거리가 줄어드는 이웃 칸으로 가면 목표에 도달한다"""
+
+    def __init__(self, tilemap, target_cell):
+        self.tilemap = tilemap
+        self.target_cell = target_cell
+        self.distance = {target_cell: 0}
+        queue = deque([target_cell])
+        while queue:
+            cell = queue.popleft()
+            next_distance = self.distance[cell] + 1
+            for neighbor in tilemap.passable_neighbors(*cell):
+                if neighbor not in self.distance:
+                    self.distance[neighbor] = next_distance
+                    queue.append(neighbor)
+        self._next = {}  # 칸별 다음 칸 (처음 조회할 때 계산)
+
+    def next_cell(self, cell):
+        """cell에서 목표 쪽으로 한 칸 이동한 칸. 도달할 수 없으면 None"""
+        if cell in self._next:
+            return self._next[cell]
+        best, best_distance = None, self.distance.get(cell)
+        if best_distance is not None:
+            for neighbor in self.tilemap.passable_neighbors(*cell):
+                distance = self.distance.get(neighbor)
+                if distance is not None and distance < best_distance:
+                    best, best_distance = neighbor, distance
+        self._next[cell] = best
+        return best
+
+
+class FlowFieldCache:
+    """목표 칸별 플로우 필드 캐시.
+
+    같은 칸에 있는 플레이어들(무리)은 필드 하나를 공유한다. tick_interval초마다 새로 계산하는 필드 수를
+    budget_per_tick으로 제한하고, 예산을 넘으면 이전 필드를 그대로 쓰거나 (없으면 None) 계산을 다음 틱으로 미룬다.
+    start_tick()이 tick_interval 안에 여러 번 불려도 (클라이언트마다 AI 갱신 요청) 예산은 한 번만 채워진다.
+    """
+
+    def __init__(self, tilemap, max_fields=64, budget_per_tick=4, tick_interval=0.1):
+        self.tilemap = tilemap
+        self.max_fields = max_fields
+        self.budget_per_tick = budget_per_tick
+        self.tick_interval = tick_interval
+        self._tick_started = float('-inf')
+        self.fields = OrderedDict()  # {target_cell: FlowField} (LRU)
+        self.latest = {}  # {target_id: target_cell} 마지막으로 필드를 얻은 칸
+        self.budget = budget_per_tick
+        self.computed = 0  # 누적 BFS 횟수 (지표)
+
+    def start_tick(self, now):
+        if now - self._tick_started >= self.tick_interval:
+            self._tick_started = now
+            self.budget = self.budget_per_tick
+
+    def field_for(self, target_id, x, y):
+        """target_id(플레이어)를 향한 필드.
+
+        새로 계산할 예산이 없으면 직전 필드를, 그것도 없으면 None을 돌려준다 (호출하는 쪽에서 직선 이동).
+        """
+        cell = self.tilemap.cell_of(x, y)
+        field = self.fields.get(cell)
+        if field is not None:
+            self.fields.move_to_end(cell)
+            self.latest[target_id] = cell
+            return field
+        if self.budget <= 0:
+            return self.fields.get(self.latest.get(target_id))
+        self.budget -= 1
+        self.computed += 1
+        field = FlowField(self.tilemap, cell)
+        self.fields[cell] = field
+        self.latest[target_id] = cell
+        if len(self.fields) > self.max_fields:
+            self.fields.popitem(last=False)
+        return field
+
+    def forget(self, target_id):
+        self.latest.pop(target_id, None)
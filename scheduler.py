@@ -0,0 +1,125 @@
+# scheduler.py
+"""프로세스 내 작업 스케줄러 (일일 롤오버, 보상 지급, 만료 처리 등)"""
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+
+class Job:
+    """스케줄러에 등록된 작업 하나"""
+
+    def __init__(self, name, func, interval=None, daily=False, run_at_start=False):
+        self.name = name
+        self.func = func
+        self.interval = interval  # 초 단위 주기 (daily가 아니면 필수)
+        self.daily = daily  # 매일 자정에 실행
+        self.run_at_start = run_at_start  # 시작 직후 한 번 실행 (서버가 꺼져 있던 동안 놓친 작업 보충)
+        self.next_run = None
+        # 실행 시간 통계
+        self.runs = 0
+        self.errors = 0
+        self.last_run = None
+        self.last_duration = 0.0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.last_error = None
+
+    def schedule_next(self, now):
+        if self.daily:
+            tomorrow = datetime.fromtimestamp(now).date() + timedelta(days=1)
+            self.next_run = datetime.combine(tomorrow, datetime.min.time()).timestamp()
+        else:
+            self.next_run = now + self.interval
+
+    def stats(self):
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'last_run': self.last_run,
+            'next_run': self.next_run,
+            'last_duration': self.last_duration,
+            'avg_duration': self.total_duration / self.runs if self.runs else 0.0,
+            'max_duration': self.max_duration,
+            'last_error': self.last_error
+        }
+
+
+class Scheduler:
+    """주기/일일 작업을 실행하는 간단한 스케줄러.
+
+    run_forever()는 백그라운드 태스크로 돌리고, 테스트에서는 trigger()로 작업을 직접 실행한다.
+    """
+
+    def __init__(self, clock=time.time, tick=1.0):
+        self.clock = clock
+        self.tick = tick  # run_forever 루프 주기 (초)
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._running = False
+
+    def add_job(self, name, func, interval=None, daily=False, run_at_start=False):
+        if not daily and not interval:
+            raise ValueError(f'Job {name} needs an interval or daily=True')
+        job = Job(name, func, interval, daily, run_at_start)
+        now = self.clock()
+        if run_at_start:
+            job.next_run = now
+        else:
+            job.schedule_next(now)
+        self.jobs[name] = job
+        return job
+
+    def job(self, name=None, interval=None, daily=False, run_at_start=False):
+        """데코레이터 형태의 add_job"""
+        def decorator(func):
+            self.add_job(name or func.__name__, func, interval, daily, run_at_start)
+            return func
+        return decorator
+
+    def _run(self, job):
+        started = time.perf_counter()
+        try:
+            job.func()
+        except Exception:
+            job.errors += 1
+            job.last_error = traceback.format_exc(limit=3)
+            print(f"Error in scheduled job {job.name}:\n{job.last_error}")
+        finally:
+            duration = time.perf_counter() - started
+            job.runs += 1
+            job.last_run = self.clock()
+            job.last_duration = duration
+            job.total_duration += duration
+            job.max_duration = max(job.max_duration, duration)
+
+    def run_pending(self):
+        """실행 시각이 된 작업을 모두 실행. 실행한 작업 이름 목록 반환"""
+        ran = []
+        with self._lock:
+            now = self.clock()
+            for job in list(self.jobs.values()):
+                if job.next_run is not None and job.next_run <= now:
+                    self._run(job)
+                    job.schedule_next(self.clock())
+                    ran.append(job.name)
+        return ran
+
+    def trigger(self, name):
+        """작업을 즉시 실행 (수동 실행/테스트용). 다음 예약 시각은 바꾸지 않는다"""
+        job = self.jobs[name]
+        with self._lock:
+            self._run(job)
+        return job.stats()
+
+    def metrics(self):
+        return {name: job.stats() for name, job in self.jobs.items()}
+
+    def run_forever(self, sleep=time.sleep):
+        self._running = True
+        while self._running:
+            self.run_pending()
+            sleep(self.tick)
+
+    def stop(self):
+        self._running = False
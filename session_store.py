@@ -0,0 +1,180 @@
+# session_store.py
+"""서버 측 세션 저장소 (쿠키에는 불투명한 세션 id만, 데이터는 SQLite + 메모리 LRU 캐시)"""
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+SESSION_ID_BYTES = 32  # 세션 id 길이 (쿠키 크기가 항상 같다)
+SESSION_TOUCH_INTERVAL = 3600  # 변경 없는 요청에서 만료 시각을 연장하는 최소 간격 (초)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """값이 바뀌면 modified가 켜지는 세션 dict"""
+
+    def __init__(self, initial=None, sid=None, new=False, expires=0):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires = expires
+        self.modified = False
+        self.rotated_from = None
+
+    def rotate(self):
+        """세션 id 재발급 (로그인 시 세션 고정 공격 방지). 이전 id는 저장할 때 삭제된다"""
+        if self.rotated_from is None and not self.new:
+            self.rotated_from = self.sid
+        self.sid = secrets.token_urlsafe(SESSION_ID_BYTES)
+        self.modified = True
+
+
+class SessionStore:
+    """SQLite에 세션을 저장하고 최근 세션은 메모리 LRU 캐시에 둔다.
+
+    행마다 저장할 때마다 바뀌는 version이 있어서, 캐시가 맞아도 행의 (version, expires) 만 다시 읽어 확인한다.
+    다른 프로세스에서 로그아웃하거나 id를 재발급하거나 내용을 바꾸면 다음 요청에서 바로 보인다.
+    캐시에는 역직렬화된 dict를 두므로 캐시가 맞으면 요청마다 JSON을 풀지 않는다.
+    """
+
+    def __init__(self, path, max_cached=1024):
+        self.path = path
+        self.max_cached = max_cached
+        self._cache = OrderedDict()  # {sid: (version, data)}
+        self._lock = threading.Lock()
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _db(self):
+        """SQLite 연결 (처음 쓸 때 열고 테이블을 만든다, 잠금 안에서 호출)"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL, '
+                               'version INTEGER NOT NULL DEFAULT 0)')
+            columns = [row[1] for row in self._conn.execute('PRAGMA table_info(sessions)')]
+            if 'version' not in columns:  # version 열이 없던 이전 DB
+                self._conn.execute('ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)')
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, sid, version, data):
+        self._cache[sid] = (version, data)
+        self._cache.move_to_end(sid)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def get(self, sid):
+        """(data, expires). 없거나 만료되었으면 None"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT version, expires FROM sessions WHERE sid = ?', (sid,)).fetchone()
+            if row is None or row[1] <= now:
+                self._cache.pop(sid, None)
+                return None
+            version, expires = row
+            cached = self._cache.get(sid)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(sid)
+                self.hits += 1
+                return cached[1], expires
+            self.misses += 1
+            row = self._db.execute('SELECT data, version FROM sessions WHERE sid = ?', (sid,)).fetchone()
+            if row is None:  # 두 조회 사이에 다른 프로세스가 삭제
+                self._cache.pop(sid, None)
+                return None
+            data = json.loads(row[0])
+            self._remember(sid, row[1], data)
+            return data, expires
+
+    def set(self, sid, data, expires):
+        data = dict(data)
+        version = secrets.randbits(62)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO sessions (sid, data, expires, version) VALUES (?, ?, ?, ?)',
+                             (sid, json.dumps(data, separators=(',', ':'), ensure_ascii=False), expires, version))
+            self._db.commit()
+            self._remember(sid, version, data)
+
+    def touch(self, sid, expires):
+        """만료 시각만 연장 (내용이 그대로라 version과 캐시는 유지)"""
+        with self._lock:
+            self._db.execute('UPDATE sessions SET expires = ? WHERE sid = ?', (expires, sid))
+            self._db.commit()
+
+    def delete(self, sid):
+        with self._lock:
+            self._db.execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+            self._db.commit()
+            self._cache.pop(sid, None)
+
+    def prune(self):
+        """만료된 세션 삭제. 삭제한 수 반환"""
+        now = time.time()
+        with self._lock:
+            deleted = self._db.execute('DELETE FROM sessions WHERE expires <= ?', (now,)).rowcount
+            self._db.commit()
+            return deleted
+
+    def stats(self):
+        with self._lock:
+            return {'cached': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Flask 세션 인터페이스. 만료 시각은 PERMANENT_SESSION_LIFETIME을 따른다"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def _expires_at(self, app):
+        return time.time() + app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            found = self.store.get(sid)
+            if found is not None:
+                data, expires = found
+                # 캐시의 dict를 요청끼리 공유하지 않도록 얕은 복사
+                return ServerSideSession(data, sid=sid, expires=expires)
+        return ServerSideSession(sid=secrets.token_urlsafe(SESSION_ID_BYTES), new=True, expires=self._expires_at(app))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.rotated_from is not None:
+            self.store.delete(session.rotated_from)
+            session.rotated_from = None
+        if not session:
+            # 비어 있는 세션은 저장하지 않는다 (로그아웃 등)
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+        if session.modified:
+            session.expires = self._expires_at(app)
+            self.store.set(session.sid, session, session.expires)
+        elif app.config['SESSION_REFRESH_EACH_REQUEST'] and \
+                self._expires_at(app) - session.expires > SESSION_TOUCH_INTERVAL:
+            session.expires = self._expires_at(app)
+            self.store.touch(session.sid, session.expires)
+        else:
+            return
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
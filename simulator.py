@@ -0,0 +1,290 @@
+# simulator.py
+"""헤드리스 월드 시뮬레이터 (용량 산정용).
+
+소켓 없이 app.py의 게임 로직을 그대로 돌린다. 난수는 시드 고정, 시계는 가상 시계,
+이벤트는 수신자 수/바이트만 세는 수집기로 바꾸고 스크립트 봇 플레이어를 실제 시간보다 빠르게 돌려서
+틱 비용과 메시지량을 보고한다.
+
+사용법: python simulator.py --bots 1000 --seconds 120 --seed 1 [--tick 0.1] [--ai-mode server|client] [--json]
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import app as game
+from scheduler import Scheduler
+
+BOT_SPEED = 180  # 봇 이동 속도 (px/초), 클라이언트 키 입력 이동과 비슷하게
+BOT_ATTACK_RANGE = 50  # 클라이언트 공격 범위와 같음
+BOT_COLLECT_RANGE = 100  # 클라이언트 수집 범위와 같음
+BOT_ACTION_COOLDOWN = 0.5  # 공격/수집 입력 간격 (초)
+BOT_SEARCH_RADIUS = 400  # 봇이 목표를 찾는 반경
+BOT_BEHAVIORS = ('hunter', 'collector', 'wanderer')
+CLIENT_AI_INTERVAL = 0.1  # 클라이언트가 monster_ai_update를 보내는 주기 (mmorpg_game.html)
+
+
+class VirtualClock:
+    """시뮬레이션 시계. advance()로만 흐른다"""
+
+    def __init__(self, start=1_000_000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class CountingSink:
+    """월드 이벤트를 보내는 대신 종류별 전송 횟수, 수신자 수, 바이트를 센다"""
+
+    def __init__(self, measure_bytes=True):
+        self.measure_bytes = measure_bytes
+        self.emits = Counter()
+        self.messages = Counter()
+        self.bytes = Counter()
+        self.duration = 0.0  # 집계에 쓴 시간 (틱 비용에서 뺀다)
+
+    def recipients(self, room, skip_sid):
+        members = game.room_members(room)
+        if skip_sid:
+            skipped = {skip_sid} if isinstance(skip_sid, str) else set(skip_sid)
+            members = [sid for sid in members if sid not in skipped]
+        return len(members)
+
+    def __call__(self, event, data, room=None, skip_sid=None):
+        started = time.perf_counter()
+        count = self.recipients(room, skip_sid)
+        self.emits[event] += 1
+        self.messages[event] += count
+        if self.measure_bytes and count:
+            self.bytes[event] += count * len(json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str))
+        self.duration += time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(fraction * len(ordered))) - 1)]
+
+
+def world_digest():
+    """월드 상태 해시 (같은 시드로 두 번 돌렸을 때 결과가 같은지 확인용)"""
+    state = {
+        'players': {sid: [p['x'], p['y'], p['hp'], p['level'], p['exp']] for sid, p in game.game_world['players'].items()},
+        'monsters': game.game_world['monsters'],
+        'items': game.game_world['items']
+    }
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class Bot:
+    """스크립트 봇 하나. hunter는 몬스터를, collector는 아이템을 쫓고 wanderer는 돌아다닌다"""
+
+    def __init__(self, session_id, behavior, rng):
+        self.session_id = session_id
+        self.behavior = behavior
+        self.rng = rng
+        self.next_action = 0.0
+        self.heading = rng.uniform(0, 2 * math.pi)
+
+    def target(self, player):
+        if self.behavior == 'hunter':
+            monster_id, _ = game.monster_grid.nearest(player['x'], player['y'], BOT_SEARCH_RADIUS)
+            if monster_id is not None:
+                return 'monster', monster_id, game.game_world['monsters'][monster_id]
+        elif self.behavior == 'collector':
+            best, best_distance = None, BOT_SEARCH_RADIUS
+            for item_id, item in game.game_world['items'].items():
+                distance = math.hypot(item['x'] - player['x'], item['y'] - player['y'])
+                if distance < best_distance:
+                    best, best_distance = item_id, distance
+            if best is not None:
+                return 'item', best, game.game_world['items'][best]
+        return None, None, None
+
+    def step(self, now, dt):
+        player = game.game_world['players'].get(self.session_id)
+        if player is None:
+            return
+        kind, target_id, target = self.target(player)
+        if target is not None:
+            distance = math.hypot(target['x'] - player['x'], target['y'] - player['y'])
+            in_range = distance <= (BOT_ATTACK_RANGE if kind == 'monster' else BOT_COLLECT_RANGE)
+            if in_range and now >= self.next_action:
+                self.next_action = now + BOT_ACTION_COOLDOWN
+                if kind == 'monster':
+                    game.player_attack_monster(self.session_id, target_id)
+                else:
+                    game.player_collect_item(self.session_id, target_id)
+                return
+            if in_range:
+                return
+            self.heading = math.atan2(target['y'] - player['y'], target['x'] - player['x'])
+        elif self.rng.random() < 0.05:
+            self.heading = self.rng.uniform(0, 2 * math.pi)
+        self.move(player, dt)
+
+    def move(self, player, dt):
+        distance = BOT_SPEED * dt
+        new_x = max(25, min(775, player['x'] + math.cos(self.heading) * distance))
+        new_y = max(25, min(575, player['y'] + math.sin(self.heading) * distance))
+        # 클라이언트와 같이 장애물에 막히면 축 하나씩 미끄러진다
+        if game.world_map.is_blocked(new_x, new_y):
+            if not game.world_map.is_blocked(new_x, player['y']):
+                new_y = player['y']
+            elif not game.world_map.is_blocked(player['x'], new_y):
+                new_x = player['x']
+            else:
+                self.heading = self.rng.uniform(0, 2 * math.pi)
+                return
+        game.move_player(self.session_id, round(new_x, 1), round(new_y, 1))
+
+
+def simulate(bots=100, seconds=60.0, seed=1, tick=0.1, ai_mode='server', measure_bytes=True):
+    """봇 bots명으로 seconds초를 시뮬레이션하고 보고서 dict 반환"""
+    clock = VirtualClock()
+    sink = CountingSink(measure_bytes)
+    bot_rng = random.Random(seed + 1)
+    with tempfile.TemporaryDirectory() as log_dir:
+        game.configure_world(rng=random.Random(seed), clock=clock, sink=sink, persist=False)
+        game.init_game_world(log_path=f'{log_dir}/events.ndjson', snapshot_path=f'{log_dir}/snapshot.json')
+        jobs = Scheduler(clock=clock)
+        for job in game.game_scheduler.jobs.values():
+            jobs.add_job(job.name, job.func, job.interval, job.daily, job.run_at_start)
+
+        bot_list = []
+        for i in range(bots):
+            session_id = f'bot{i:05d}'
+            game.add_player(session_id, session_id, {})
+            bot_list.append(Bot(session_id, BOT_BEHAVIORS[i % len(BOT_BEHAVIORS)], bot_rng))
+        join_messages = sum(sink.messages.values())
+
+        # bots = 봇 입력과 그 입력을 처리한 게임 로직 (이동/공격/수집)
+        phases = {'bots': [], 'ai': [], 'broadcast': [], 'jobs': [], 'total': []}
+        awake = []
+        ai_due = 0.0
+        ticks = int(round(seconds / tick))
+        # 구간 시간에서 수집기가 쓴 시간은 뺀다 (실제 서버에는 없는 비용)
+        elapsed = lambda: time.perf_counter() - sink.duration
+        wall_started = time.perf_counter()
+        for _ in range(ticks):
+            clock.advance(tick)
+            marks = [elapsed()]
+
+            for bot in bot_list:
+                bot.step(clock.now, tick)
+            marks.append(elapsed())
+
+            # server: 틱마다 한 번 / client: 지금처럼 클라이언트마다 CLIENT_AI_INTERVAL로 AI 갱신 + 전체 방송
+            ai_runs = 1 if ai_mode == 'server' else 0
+            if ai_mode == 'client':
+                ai_due += tick
+                while ai_due >= CLIENT_AI_INTERVAL:
+                    ai_due -= CLIENT_AI_INTERVAL
+                    ai_runs += len(bot_list)
+            ai_time = broadcast_time = 0.0
+            for _ in range(ai_runs):
+                started = elapsed()
+                game.update_monster_ai()
+                middle = elapsed()
+                game.broadcast_world_state()
+                ai_time += middle - started
+                broadcast_time += elapsed() - middle
+            marks.append(elapsed())
+
+            jobs.run_pending()
+            marks.append(elapsed())
+
+            phases['bots'].append(marks[1] - marks[0])
+            phases['ai'].append(ai_time)
+            phases['broadcast'].append(broadcast_time)
+            phases['jobs'].append(marks[3] - marks[2])
+            phases['total'].append(marks[3] - marks[0])
+            awake.append(len(game.awake_monsters))
+        wall_seconds = time.perf_counter() - wall_started
+        game.event_log.close()
+
+    simulated = ticks * tick
+    return {
+        'config': {'bots': bots, 'seconds': simulated, 'seed': seed, 'tick': tick, 'ai_mode': ai_mode},
+        'wall_seconds': wall_seconds,
+        'speedup': simulated / wall_seconds if wall_seconds else float('inf'),
+        'tick_ms': {
+            phase: {
+                'mean': 1000 * sum(values) / len(values) if values else 0.0,
+                'p50': 1000 * percentile(values, 0.50),
+                'p95': 1000 * percentile(values, 0.95),
+                'p99': 1000 * percentile(values, 0.99),
+                'max': 1000 * max(values, default=0.0)
+            } for phase, values in phases.items()
+        },
+        'tick_budget_used': (sum(phases['total']) / len(phases['total']) / tick) if ticks else 0.0,
+        'join_messages': join_messages,
+        'events': {
+            event: {
+                'emits': sink.emits[event],
+                'messages_per_sec': sink.messages[event] / simulated if simulated else 0.0,
+                'kbytes_per_sec': sink.bytes[event] / 1024 / simulated if simulated else 0.0
+            } for event in sorted(sink.emits)
+        },
+        'messages_per_sec': sum(sink.messages.values()) / simulated if simulated else 0.0,
+        'kbytes_per_sec_per_client': sum(sink.bytes.values()) / 1024 / simulated / bots if simulated and bots else 0.0,
+        'world': {
+            'awake_monsters_avg': sum(awake) / len(awake) if awake else 0.0,
+            'flow_fields_computed': game.flow_fields.computed,
+            'monsters': game.monster_spawner.stats(),
+            'items': game.item_spawner.stats(),
+            'event_log': dict(game.event_log.counts),
+            'digest': world_digest()
+        }
+    }
+
+
+def print_report(report):
+    config = report['config']
+    print(f"{config['bots']} bots, {config['seconds']:.0f}s simulated (tick {config['tick']}s, seed {config['seed']}, "
+          f"ai {config['ai_mode']}) in {report['wall_seconds']:.2f}s wall ({report['speedup']:.1f}x real time)")
+    print(f"\n{'phase':10s} {'mean':>9s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'max':>9s}  (ms per tick)")
+    for phase, stats in report['tick_ms'].items():
+        print(f"{phase:10s} " + ' '.join(f"{stats[key]:9.3f}" for key in ('mean', 'p50', 'p95', 'p99', 'max')))
+    print(f"tick budget used: {report['tick_budget_used'] * 100:.1f}%")
+    print(f"\n{'event':26s} {'emits':>9s} {'msgs/s':>11s} {'KiB/s':>11s}")
+    for event, stats in report['events'].items():
+        print(f"{event:26s} {stats['emits']:9d} {stats['messages_per_sec']:11.1f} {stats['kbytes_per_sec']:11.1f}")
+    print(f"total {report['messages_per_sec']:.1f} msgs/s, {report['kbytes_per_sec_per_client']:.2f} KiB/s per client "
+          f"(+{report['join_messages']} join messages)")
+    world = report['world']
+    print(f"\nawake monsters avg {world['awake_monsters_avg']:.1f}, flow fields computed {world['flow_fields_computed']}, "
+          f"events {world['event_log']}, digest {world['digest']}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Headless world simulator')
+    parser.add_argument('--bots', type=int, default=100)
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tick', type=float, default=0.1)
+    parser.add_argument('--ai-mode', choices=('server', 'client'), default='server',
+                        help='server: one AI update per tick; client: every client triggers one every 0.1s (current game)')
+    parser.add_argument('--no-bytes', action='store_true', help='skip payload size measurement (faster)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+    report = simulate(args.bots, args.seconds, args.seed, args.tick, args.ai_mode, not args.no_bytes)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
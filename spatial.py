@@ -0,0 +1,80 @@
+# spatial.py
+"""엔티티 위치 조회용 균일 격자 공간 인덱스"""
+from collections import defaultdict
+
+
+class SpatialGrid:
+    """cell_size 크기의 칸으로 나눈 격자. 반경 조회는 주변 칸만 살펴본다"""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        # 칸 멤버는 dict로 둔다 (set과 달리 순회 순서가 삽입 순서라 시뮬레이션이 재현 가능)
+        self.cells = defaultdict(dict)  # {(cx, cy): {entity_id: None}}
+        self.positions = {}  # {entity_id: (x, y)}
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def position(self, entity_id):
+        """인덱스에 있는 엔티티의 (x, y). 없으면 None"""
+        return self.positions.get(entity_id)
+
+    def insert(self, entity_id, x, y):
+        if entity_id in self.positions:
+            self.move(entity_id, x, y)
+            return
+        self.positions[entity_id] = (x, y)
+        self.cells[self._cell(x, y)][entity_id] = None
+
+    def move(self, entity_id, x, y):
+        old = self.positions.get(entity_id)
+        if old is None:
+            self.insert(entity_id, x, y)
+            return
+        old_cell = self._cell(*old)
+        new_cell = self._cell(x, y)
+        self.positions[entity_id] = (x, y)
+        if old_cell != new_cell:
+            self._discard(old_cell, entity_id)
+            self.cells[new_cell][entity_id] = None
+
+    def remove(self, entity_id):
+        old = self.positions.pop(entity_id, None)
+        if old is not None:
+            self._discard(self._cell(*old), entity_id)
+
+    def _discard(self, cell, entity_id):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.pop(entity_id, None)
+            if not members:
+                del self.cells[cell]
+
+    def query_radius(self, x, y, radius):
+        """(x, y)에서 radius 안에 있는 엔티티의 (id, 거리) 목록"""
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+        radius_sq = radius * radius
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for entity_id in self.cells.get((cx, cy), ()):
+                    ex, ey = self.positions[entity_id]
+                    distance_sq = (ex - x) ** 2 + (ey - y) ** 2
+                    if distance_sq <= radius_sq:
+                        found.append((entity_id, distance_sq ** 0.5))
+        return found
+
+    def nearest(self, x, y, radius):
+        """radius 안에서 가장 가까운 엔티티의 (id, 거리). 없으면 (None, inf)"""
+        best_id, best_distance = None, float('inf')
+        for entity_id, distance in self.query_radius(x, y, radius):
+            if distance < best_distance:
+                best_id, best_distance = entity_id, distance
+        return best_id, best_distance
@@ -0,0 +1,127 @@
+# spawner.py
+"""스폰 테이블 기반 몬스터/아이템 생성기 (개체 수 카운터, 리스폰 지연, 개체 풀)"""
+import heapq
+import itertools
+import json
+import random
+import time
+from collections import deque
+
+MAX_PLACEMENT_TRIES = 20  # 배치 가능한 위치를 찾을 때 최대 시도 횟수
+ID_REUSE_DELAY = 10  # 제거된 id를 다시 쓰기까지 기다리는 시간 (초), 늦게 도착한 이벤트/요청이 새 개체를 가리키지 않도록
+
+
+def load_spawn_tables(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class Spawner:
+    """한 종류(몬스터 또는 아이템)의 스폰 그룹들을 관리한다.
+
+    그룹별 개체 수를 직접 세어 두므로 리스폰 확인은 O(1)이고,
+    제거된 개체의 dict와 id는 풀에 넣었다가 다음 스폰에 다시 쓴다.
+    id는 제거된 순서대로, ID_REUSE_DELAY가 지난 것만 다시 쓴다.
+    """
+
+    def __init__(self, groups, regions, entities, id_prefix, on_spawn=None, can_place=None, rng=random, clock=time.time):
+        self.groups = groups  # {group: {cap, respawn_delay, regions: {region: weight}, types, template}}
+        self.regions = regions  # {region: {x: [min, max], y: [min, max]}}
+        self.entities = entities  # 생성된 개체를 넣을 dict (game_world['monsters'] 등)
+        self.id_prefix = id_prefix
+        self.on_spawn = on_spawn
+        self.can_place = can_place  # (x, y) -> bool, 장애물 등 배치 불가 위치 거르기
+        self.rng = rng
+        self.clock = clock
+        self.counts = {group: 0 for group in groups}
+        self.entity_groups = {}  # {entity_id: group}
+        self._respawns = []  # (due_time, seq, group) 힙
+        self._respawn_seq = itertools.count()
+        self._free_entities = {group: [] for group in groups}
+        self._free_ids = deque()  # (다시 쓸 수 있는 시각, id), 제거된 순서
+        self._last_id = 0
+        # 지역 가중치는 그룹마다 미리 풀어 둔다
+        self._region_choices = {
+            group: (list(config['regions']), list(config['regions'].values()))
+            for group, config in groups.items()
+        }
+
+    def _new_id(self):
+        if self._free_ids and self._free_ids[0][0] <= self.clock():
+            return self._free_ids.popleft()[1]
+        self._last_id += 1
+        return f'{self.id_prefix}{self._last_id}'
+
+    def spawn(self, group):
+        """그룹 개체 하나 생성. 상한에 도달했으면 None"""
+        config = self.groups[group]
+        if self.counts[group] >= config['cap']:
+            return None
+        names, weights = self._region_choices[group]
+        region = self.regions[self.rng.choices(names, weights)[0]]
+        free = self._free_entities[group]
+        entity = free.pop() if free else {}
+        entity.clear()
+        entity.update(config['template'])
+        for _ in range(MAX_PLACEMENT_TRIES):
+            entity['x'] = self.rng.randint(*region['x'])
+            entity['y'] = self.rng.randint(*region['y'])
+            if self.can_place is None or self.can_place(entity['x'], entity['y']):
+                break
+        entity['type'] = self.rng.choice(config['types'])
+        entity_id = self._new_id()
+        self.entities[entity_id] = entity
+        self.entity_groups[entity_id] = group
+        self.counts[group] += 1
+        if self.on_spawn:
+            self.on_spawn(entity_id, entity)
+        return entity_id
+
+    def adopt(self, entity_id, group):
+        """복구 등으로 밖에서 넣은 개체를 카운터에 반영"""
+        if group in self.counts and entity_id not in self.entity_groups:
+            self.entity_groups[entity_id] = group
+            self.counts[group] += 1
+            # 새로 만드는 id가 복구된 id와 겹치지 않도록
+            suffix = entity_id[len(self.id_prefix):]
+            if entity_id.startswith(self.id_prefix) and suffix.isdigit():
+                self._last_id = max(self._last_id, int(suffix))
+
+    def release(self, entity_id):
+        """개체 제거 - dict/id를 풀에 돌려주고 리스폰을 예약한다. 제거한 개체 반환"""
+        entity = self.entities.pop(entity_id, None)
+        group = self.entity_groups.pop(entity_id, None)
+        if group is None:
+            return entity
+        self.counts[group] -= 1
+        self._free_entities[group].append(entity)
+        self._free_ids.append((self.clock() + ID_REUSE_DELAY, entity_id))
+        heapq.heappush(self._respawns, (self.clock() + self.groups[group]['respawn_delay'], next(self._respawn_seq), group))
+        return entity
+
+    def fill(self):
+        """상한까지 빈 자리를 즉시 채운다 (시작 시 사용)"""
+        spawned = []
+        for group, config in self.groups.items():
+            while self.counts[group] < config['cap']:
+                spawned.append(self.spawn(group))
+        self._respawns.clear()
+        return spawned
+
+    def tick(self):
+        """리스폰 시각이 된 예약을 처리. 생성한 id 목록 반환"""
+        now = self.clock()
+        spawned = []
+        while self._respawns and self._respawns[0][0] <= now:
+            _, _, group = heapq.heappop(self._respawns)
+            entity_id = self.spawn(group)
+            if entity_id:
+                spawned.append(entity_id)
+        return spawned
+
+    def stats(self):
+        return {
+            'counts': dict(self.counts),
+            'pending_respawns': len(self._respawns),
+            'pooled_entities': sum(len(free) for free in self._free_entities.values())
+        }